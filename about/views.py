@@ -1,10 +1,15 @@
+from django.utils.decorators import method_decorator
 from django.views.generic.base import TemplateView
 
+from yatube.pagecache import surrogate_keys
 
+
+@method_decorator(surrogate_keys('about'), name='dispatch')
 class AboutAuthorView(TemplateView):
     template_name = 'about/author.html'
 
 
+@method_decorator(surrogate_keys('about'), name='dispatch')
 class AboutTechView(TemplateView):
     template_name = 'about/tech.html'
 
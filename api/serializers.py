@@ -0,0 +1,89 @@
+from django.urls import reverse
+
+from posts.models import UserStats
+
+# Представления моделей для JSON API. Каждое поле - функция от объекта;
+# клиент может запросить только часть полей параметром ?fields=a,b.
+
+
+def _url(name, *args):
+    return reverse(name, args=args)
+
+
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date.isoformat(),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'comments_count': lambda post: post.comments_count,
+    'updated_at': lambda post: post.updated_at.isoformat(),
+    'url': lambda post: _url('post', post.author.username, post.pk),
+}
+
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'post': lambda comment: comment.post_id,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: comment.created.isoformat(),
+    'updated_at': lambda comment: comment.updated_at.isoformat(),
+}
+
+FOLLOW_FIELDS = {
+    'id': lambda follow: follow.pk,
+    'author': lambda follow: follow.author.username,
+    'created': lambda follow: follow.created.isoformat(),
+}
+
+TOMBSTONE_FIELDS = {
+    'kind': lambda tombstone: tombstone.kind,
+    'id': lambda tombstone: tombstone.object_id,
+    'deleted_at': lambda tombstone: tombstone.deleted_at.isoformat(),
+}
+
+GROUP_FIELDS = {
+    'id': lambda group: group.pk,
+    'slug': lambda group: group.slug,
+    'title': lambda group: group.title,
+    'description': lambda group: group.description,
+    'posts_count': lambda group: group.posts_count,
+    'url': lambda group: _url('group', group.slug),
+}
+
+USER_FIELDS = {
+    'id': lambda user: user.pk,
+    'username': lambda user: user.username,
+    'full_name': lambda user: user.get_full_name(),
+    'posts_count': lambda user: _stats(user).posts_count,
+    'followers_count': lambda user: _stats(user).followers_count,
+    'following_count': lambda user: _stats(user).following_count,
+    'url': lambda user: _url('profile', user.username),
+}
+
+
+def _stats(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+class FieldsError(ValueError):
+    pass
+
+
+# запрошенные поля; неизвестное поле - ошибка клиента
+def parse_fields(value, available):
+    if not value:
+        return list(available)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise FieldsError('Неизвестные поля: ' + ', '.join(unknown))
+    return fields
+
+
+def serialize(obj, available, fields):
+    return {field: available[field](obj) for field in fields}
@@ -0,0 +1,169 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import social, sync
+from posts.models import Comment, Group, Post
+from posts.paginator import encode_cursor
+
+
+# класс тестирования синхронизации изменений
+@override_settings(SYNC_OVERLAP=0)
+class SyncViewTest(TestCase):
+    AUTH_USER_NAME = 'TestUser'
+    AUTHOR_NAME = 'Author'
+    GROUP_SLUG = 'test-group'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(
+            username=cls.AUTH_USER_NAME)
+        cls.author = get_user_model().objects.create(
+            username=cls.AUTHOR_NAME)
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug=cls.GROUP_SLUG)
+
+    def setUp(self):
+        self.posts = [Post.objects.create(text=f'Запись {i}',
+                                          author=self.author,
+                                          group=self.group)
+                      for i in range(3)]
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.url = reverse('api_v1:sync')
+
+    def sync(self, client=None, **params):
+        client = client or self.guest_client
+        response = client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_changes_since_token(self):
+        """Синхронизация возвращает новые, измененные и удаленные объекты"""
+        token = self.sync()['token']
+        new_post = Post.objects.create(text='Новая', author=self.author)
+        self.posts[0].text = 'Исправленная'
+        self.posts[0].save()
+        comment = Comment.objects.create(post=self.posts[1],
+                                         author=self.user, text='Коммент')
+        deleted_id = self.posts[2].pk
+        self.posts[2].delete()
+
+        data = self.sync(token=token)
+        self.assertEqual({post['id'] for post in data['posts']},
+                         {new_post.pk, self.posts[0].pk})
+        self.assertEqual([item['id'] for item in data['comments']],
+                         [comment.pk])
+        self.assertEqual(data['deleted'], [{
+            'kind': 'post', 'id': deleted_id,
+            'deleted_at': data['deleted'][0]['deleted_at'],
+        }])
+        self.assertFalse(data['has_more'])
+
+        data = self.sync(token=data['token'])
+        self.assertEqual(data['posts'] + data['comments'] + data['deleted'],
+                         [], 'Повторная синхронизация вернула изменения')
+
+    def test_group_scope(self):
+        """Область группы не включает посты вне группы"""
+        token = self.sync(scope=f'group:{self.GROUP_SLUG}')['token']
+        Post.objects.create(text='Без группы', author=self.author)
+        in_group = Post.objects.create(text='В группе', author=self.author,
+                                       group=self.group)
+        data = self.sync(scope=f'group:{self.GROUP_SLUG}', token=token)
+        self.assertEqual([post['id'] for post in data['posts']],
+                         [in_group.pk])
+
+    @override_settings(SYNC_MAX_ITEMS=2)
+    def test_has_more(self):
+        """Большие изменения отдаются порциями"""
+        token = self.sync()['token']
+        created = {Post.objects.create(text=f'Новая {i}',
+                                       author=self.author).pk
+                   for i in range(5)}
+        received = set()
+        for _ in range(5):
+            data = self.sync(token=token)
+            received.update(post['id'] for post in data['posts'])
+            token = data['token']
+            if not data['has_more']:
+                break
+        self.assertEqual(received, created)
+
+    def test_follow_scope(self):
+        """Область подписок содержит подписки и отписки пользователя"""
+        url_token = self.sync(self.authorized_client, scope='follow')['token']
+        social.follow_many(self.user, [self.author])
+        data = self.sync(self.authorized_client, scope='follow',
+                         token=url_token)
+        self.assertEqual([item['author'] for item in data['follows']],
+                         [self.AUTHOR_NAME])
+        social.unfollow_many(self.user, [self.author])
+        data = self.sync(self.authorized_client, scope='follow',
+                         token=data['token'])
+        self.assertEqual([item['kind'] for item in data['deleted']
+                          if item['kind'] != 'moved'], ['follow'])
+        response = self.guest_client.get(self.url, {'scope': 'follow'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_expired_token(self):
+        """Токен старше срока хранения следов требует полной загрузки"""
+        token = sync.encode_token(timezone.now() - timedelta(days=365))
+        response = self.guest_client.get(self.url, {'token': token})
+        self.assertEqual(response.status_code, 410)
+
+    def test_invalid_token(self):
+        """Токен без часового пояса, из будущего или с неверной датой -
+        ошибка запроса, а не падение"""
+        for values in (['2030-01-01T00:00:00', 1],
+                       [(timezone.now() + timedelta(days=1)).isoformat(), 1],
+                       ['2020-13-45T00:00:00+00:00', 1]):
+            with self.subTest(values=values):
+                response = self.guest_client.get(
+                    self.url, {'token': encode_cursor(values)})
+                self.assertEqual(response.status_code, 400)
+
+    def test_post_moved_out_of_group(self):
+        """Пост, ушедший из группы, приходит в области группы следом
+        moved; вернувшийся пост снова приходит записью"""
+        scope = f'group:{self.GROUP_SLUG}'
+        token = self.sync(scope=scope)['token']
+        post = self.posts[0]
+        post.group = None
+        post.save()
+        data = self.sync(scope=scope, token=token)
+        self.assertEqual([(item['kind'], item['id'])
+                          for item in data['deleted']],
+                         [('moved', post.pk)])
+
+        post.group = self.group
+        post.save()
+        data = self.sync(scope=scope, token=token)
+        self.assertEqual(data['deleted'], [])
+        self.assertEqual([item['id'] for item in data['posts']], [post.pk])
+
+    def test_posts_leave_follow_scope(self):
+        """После отписки посты автора уходят из области подписок"""
+        social.follow_many(self.user, [self.author])
+        token = self.sync(self.authorized_client, scope='follow')['token']
+        social.unfollow_many(self.user, [self.author])
+        data = self.sync(self.authorized_client, scope='follow',
+                         token=token)
+        moved = {item['id'] for item in data['deleted']
+                 if item['kind'] == 'moved'}
+        self.assertEqual(moved, {post.pk for post in self.posts})
+
+    def test_index_hides_follow_tombstones(self):
+        """Общая лента не показывает чужие отписки и уходы из групп"""
+        social.follow_many(self.user, [self.author])
+        token = self.sync()['token']
+        social.unfollow_many(self.user, [self.author])
+        post = self.posts[0]
+        post.group = None
+        post.save()
+        self.assertEqual(self.sync(token=token)['deleted'], [])
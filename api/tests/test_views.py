@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import social
+from posts.models import Comment, Group, Post
+
+
+# класс тестирования JSON API
+class ApiViewsTest(TestCase):
+    AUTH_USER_NAME = 'TestUser'
+    AUTHOR_NAME = 'Author'
+    GROUP_SLUG = 'test-group'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(
+            username=cls.AUTH_USER_NAME)
+        cls.author = get_user_model().objects.create(
+            username=cls.AUTHOR_NAME)
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug=cls.GROUP_SLUG)
+        cls.posts = [Post.objects.create(text=f'Запись {i}',
+                                         author=cls.author,
+                                         group=cls.group)
+                     for i in range(5)]
+        Comment.objects.create(post=cls.posts[0], author=cls.user,
+                               text='Комментарий')
+        social.follow_many(cls.user, [cls.author])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_cursor_pagination(self):
+        """Лента листается курсором до конца"""
+        url = reverse('api_v1:post_list') + '?limit=2'
+        texts = []
+        while url:
+            data = self.guest_client.get(url).json()
+            texts.extend(post['text'] for post in data['results'])
+            url = data['next']
+        self.assertEqual(texts, [f'Запись {i}' for i in range(4, -1, -1)])
+
+    def test_sparse_fields(self):
+        """Параметр fields ограничивает набор полей"""
+        data = self.guest_client.get(
+            reverse('api_v1:post_detail', args=[self.posts[0].pk]),
+            {'fields': 'id,comments_count'}).json()
+        self.assertEqual(data, {'id': self.posts[0].pk,
+                                'comments_count': 1})
+        response = self.guest_client.get(reverse('api_v1:post_list'),
+                                         {'fields': 'password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_lookup(self):
+        """ids возвращает объекты в порядке запроса"""
+        ids = [self.posts[3].pk, self.posts[1].pk, 10 ** 6]
+        data = self.guest_client.get(
+            reverse('api_v1:post_list'),
+            {'ids': ','.join(map(str, ids)), 'fields': 'id'}).json()
+        self.assertEqual([post['id'] for post in data['results']], ids[:2])
+        data = self.guest_client.get(
+            reverse('api_v1:user_list'),
+            {'ids': f'{self.author.pk},{self.user.pk}',
+             'fields': 'username,posts_count'}).json()
+        self.assertEqual(data['results'], [
+            {'username': self.AUTHOR_NAME, 'posts_count': 5},
+            {'username': self.AUTH_USER_NAME, 'posts_count': 0},
+        ])
+
+    def test_etag(self):
+        """Повторный запрос с ETag получает 304"""
+        url = reverse('api_v1:group_posts', args=[self.GROUP_SLUG])
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_delete_moves_last_modified(self):
+        """Удаление поста двигает Last-Modified ленты API"""
+        Post.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        Comment.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        url = reverse('api_v1:post_list')
+        last_modified = self.guest_client.get(url)['Last-Modified']
+        Post.objects.filter(pk=self.posts[4].pk).delete()
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow_requires_auth(self):
+        """Лента подписок доступна только авторизованным"""
+        url = reverse('api_v1:follow_posts')
+        self.assertEqual(self.guest_client.get(url).status_code, 401)
+        data = self.authorized_client.get(url).json()
+        self.assertEqual(len(data['results']), 5)
+
+    def test_not_found_is_json(self):
+        """Несуществующий объект - JSON с кодом 404"""
+        response = self.guest_client.get(
+            reverse('api_v1:user_detail', args=['nobody']))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('error', response.json())
@@ -0,0 +1,21 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.post_list, name='post_list'),
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
+    path('groups/<slug:slug>/', views.group_detail, name='group_detail'),
+    path('groups/<slug:slug>/posts/', views.group_posts,
+         name='group_posts'),
+    path('users/', views.user_list, name='user_list'),
+    path('users/<str:username>/', views.user_detail, name='user_detail'),
+    path('users/<str:username>/posts/', views.user_posts,
+         name='user_posts'),
+    path('follow/', views.follow_posts, name='follow_posts'),
+    path('sync/', views.sync_changes, name='sync'),
+]
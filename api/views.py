@@ -0,0 +1,224 @@
+from functools import partial, wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from posts import feeds, sync
+from posts.conditional import (Validators, conditional, follow_querysets,
+                               group_querysets, index_querysets,
+                               post_validators, profile_querysets)
+from posts.models import Group, Post
+from posts.paginator import KeysetPaginator
+
+from .serializers import (COMMENT_FIELDS, FOLLOW_FIELDS, GROUP_FIELDS,
+                          POST_FIELDS, TOMBSTONE_FIELDS, USER_FIELDS,
+                          FieldsError, parse_fields, serialize)
+
+User = get_user_model()
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# общая обвязка вью API: только GET, ошибки в виде JSON
+def api_view(login_required=False):
+    def decorator(view_func):
+        @require_GET
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if login_required and not request.user.is_authenticated:
+                return JsonResponse({'error': 'Требуется авторизация'},
+                                    status=401)
+            try:
+                return view_func(request, *args, **kwargs)
+            except Http404:
+                return JsonResponse({'error': 'Не найдено'}, status=404)
+            except (ApiError, FieldsError) as error:
+                return JsonResponse({'error': str(error)},
+                                    status=getattr(error, 'status', 400))
+        return wrapper
+    return decorator
+
+
+def _fields(request, available):
+    return parse_fields(request.GET.get('fields'), available)
+
+
+def _ids(request):
+    try:
+        ids = [int(value) for value in request.GET['ids'].split(',')
+               if value]
+    except ValueError:
+        raise ApiError('ids - список чисел через запятую')
+    if len(ids) > settings.API_MAX_IDS:
+        raise ApiError(f'Не больше {settings.API_MAX_IDS} ids за запрос')
+    return ids
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.POSTS_IN_PAGE))
+    except ValueError:
+        raise ApiError('limit - число')
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri('?' + query.urlencode())
+
+
+# страница выборки по курсору; paginator_factory(per_page) заменяет
+# KeysetPaginator, например для ленты подписок
+def paginated(request, queryset, available, ordering=('-pub_date', '-id'),
+              paginator_factory=None):
+    fields = _fields(request, available)
+    if paginator_factory is None:
+        paginator = KeysetPaginator(queryset, _limit(request), ordering)
+    else:
+        paginator = paginator_factory(_limit(request))
+    page = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [serialize(obj, available, fields) for obj in page],
+        'next': _page_url(request, page.next_cursor),
+        'previous': _page_url(request, page.previous_cursor),
+    })
+
+
+# выборка по ?ids=; порядок ответа совпадает с порядком ids
+def batch(request, queryset, available):
+    fields = _fields(request, available)
+    ids = _ids(request)
+    objects = queryset.in_bulk(ids)
+    return JsonResponse({
+        'results': [serialize(objects[pk], available, fields)
+                    for pk in ids if pk in objects],
+    })
+
+
+def post_querysets(request, post_id):
+    return post_validators(post_id)
+
+
+# у пользователей нет даты изменения, ETag зависит только от версий
+# тегов запрошенных профилей
+def user_querysets(request):
+    ids = _ids(request) if 'ids' in request.GET else []
+    return Validators([], [f'author:{pk}' for pk in ids])
+
+
+@api_view()
+@conditional(index_querysets)
+def post_list(request):
+    if 'ids' in request.GET:
+        return batch(request, feeds.index_posts(), POST_FIELDS)
+    return paginated(request, feeds.index_posts(), POST_FIELDS)
+
+
+@api_view()
+@conditional(post_querysets)
+def post_detail(request, post_id):
+    post = get_object_or_404(feeds.index_posts(), pk=post_id)
+    return JsonResponse(serialize(post, POST_FIELDS,
+                                  _fields(request, POST_FIELDS)))
+
+
+@api_view()
+@conditional(post_querysets)
+def post_comments(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    return paginated(request, feeds.post_comments(post), COMMENT_FIELDS,
+                     ordering=('-created', '-id'))
+
+
+@api_view()
+@conditional(group_querysets)
+def group_detail(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return JsonResponse(serialize(group, GROUP_FIELDS,
+                                  _fields(request, GROUP_FIELDS)))
+
+
+@api_view()
+@conditional(group_querysets)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return paginated(request, feeds.group_posts(group), POST_FIELDS)
+
+
+@api_view()
+@conditional(user_querysets)
+def user_list(request):
+    if 'ids' not in request.GET:
+        raise ApiError('Нужен параметр ids')
+    return batch(request, User.objects.select_related('stats'),
+                 USER_FIELDS)
+
+
+@api_view()
+@conditional(profile_querysets)
+def user_detail(request, username):
+    user = get_object_or_404(User.objects.select_related('stats'),
+                             username=username)
+    return JsonResponse(serialize(user, USER_FIELDS,
+                                  _fields(request, USER_FIELDS)))
+
+
+@api_view()
+@conditional(profile_querysets)
+def user_posts(request, username):
+    author = get_object_or_404(User, username=username)
+    return paginated(request, feeds.author_posts(author), POST_FIELDS)
+
+
+@api_view(login_required=True)
+@conditional(follow_querysets)
+def follow_posts(request):
+    return paginated(
+        request, feeds.follow_posts(request.user), POST_FIELDS,
+        paginator_factory=partial(feeds.follow_paginator, request.user))
+
+
+# изменения с момента токена: ?scope=index|group:<slug>|author:<username>
+# |follow&token=...; без токена возвращается только токен на "сейчас"
+@api_view()
+def sync_changes(request):
+    scope_name = request.GET.get('scope', 'index')
+    if scope_name == 'follow' and not request.user.is_authenticated:
+        raise ApiError('Требуется авторизация', status=401)
+    try:
+        scope = sync.get_scope(scope_name, request.user)
+        token = request.GET.get('token')
+        if not token:
+            return JsonResponse({'token': sync.encode_token(
+                timezone.now()), 'has_more': False})
+        since = sync.decode_token(token)
+    except sync.TokenExpired:
+        raise ApiError('Токен устарел, загрузите ленту заново', status=410)
+    except ValueError as error:
+        raise ApiError(str(error))
+
+    found = sync.changes(scope, since, settings.SYNC_MAX_ITEMS)
+    return JsonResponse({
+        'posts': [serialize(post, POST_FIELDS, POST_FIELDS)
+                  for post in found['posts']],
+        'comments': [serialize(comment, COMMENT_FIELDS, COMMENT_FIELDS)
+                     for comment in found['comments']],
+        'follows': [serialize(follow, FOLLOW_FIELDS, FOLLOW_FIELDS)
+                    for follow in found['follows']],
+        'deleted': [serialize(tombstone, TOMBSTONE_FIELDS,
+                              TOMBSTONE_FIELDS)
+                    for tombstone in found['deleted']],
+        'token': found['token'],
+        'has_more': found['has_more'],
+    })
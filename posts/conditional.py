@@ -0,0 +1,173 @@
+import hashlib
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db.models import Max, Q
+from django.views.decorators.http import condition
+
+from . import social, timeline
+from .models import Comment, Follow, Group, Post, Tombstone, User
+
+# Валидаторы для условных GET-запросов (ETag и Last-Modified). Считаются
+# запросами MAX() по индексам, без отрисовки страницы: если клиент прислал
+# совпадающий If-None-Match или If-Modified-Since, вью отвечает 304 до
+# рендеринга шаблона.
+#
+# Last-Modified - самая поздняя из дат области страницы: updated_at постов
+# и комментариев, deleted_at следов удалений и ухода постов из области,
+# created подписок (они меняют счетчики профиля). Этого достаточно
+# клиентам, которые присылают только If-Modified-Since.
+#
+# То, что датами не отмечается (переименование группы или автора,
+# готовые варианты картинок), меняет версии тегов страницы: в ETag входят
+# версии ее тегов (etag:index, etag:post:<id>, etag:group:<id>,
+# etag:author:<id>, etag:follower:<id>), а не одна версия на весь сайт.
+
+TAG_PREFIX = 'etag:'
+
+Validators = namedtuple('Validators', 'dates tags')
+
+
+def bump_version(*tags):
+    cache.invalidate_tags(*(TAG_PREFIX + tag for tag in tags))
+
+
+def content_version(*tags):
+    versions = cache.tag_versions(*(TAG_PREFIX + tag for tag in tags))
+    return ','.join(f'{tag}={version}'
+                    for tag, version in sorted(versions.items()))
+
+
+# теги страниц, на которых виден пост
+def post_tags(post_id, author_id, *group_ids):
+    tags = ['index', f'post:{post_id}', f'author:{author_id}']
+    tags.extend(f'group:{group_id}' for group_id in set(group_ids)
+                if group_id is not None)
+    return tags
+
+
+def bump_post(post_id, author_id, *group_ids):
+    bump_version(*post_tags(post_id, author_id, *group_ids))
+
+
+# подписка меняет счетчики обоих профилей и ленту подписчика
+def bump_follows(user_id, *author_ids):
+    tags = [f'author:{user_id}', f'follower:{user_id}']
+    tags.extend(f'author:{author_id}' for author_id in author_ids)
+    bump_version(*tags)
+
+
+# (queryset, поле даты) -> самая поздняя дата
+def _latest(dates):
+    found = [queryset.aggregate(latest=Max(field))['latest']
+             for queryset, field in dates]
+    found = [date for date in found if date is not None]
+    return max(found) if found else None
+
+
+def conditional(get_querysets):
+    """Декоратор вью: ETag и Last-Modified по Validators из
+    get_querysets."""
+
+    def validators(request, *args, **kwargs):
+        # condition() вызывает обе функции, считаем MAX() один раз
+        if not hasattr(request, '_validators'):
+            found = get_querysets(request, *args, **kwargs)
+            request._validators = (_latest(found.dates), found.tags)
+        return request._validators
+
+    def latest(request, *args, **kwargs):
+        return validators(request, *args, **kwargs)[0]
+
+    def etag(request, *args, **kwargs):
+        modified, tags = validators(request, *args, **kwargs)
+        source = '{}:{}:{}'.format(
+            modified.isoformat() if modified else '',
+            content_version(*tags),
+            getattr(request.user, 'pk', None),
+        )
+        return hashlib.md5(source.encode()).hexdigest()
+
+    return condition(etag_func=etag, last_modified_func=latest)
+
+
+def _tombstones(**lookups):
+    return Tombstone.objects.filter(**lookups), 'deleted_at'
+
+
+def index_querysets(request):
+    return Validators([
+        (Post.objects.all(), 'updated_at'),
+        (Comment.objects.all(), 'updated_at'),
+        _tombstones(kind__in=(Tombstone.POST, Tombstone.COMMENT)),
+    ], ['index'])
+
+
+def group_querysets(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    posts = Post.objects.filter(group_id=group_id)
+    return Validators([
+        (posts, 'updated_at'),
+        (Comment.objects.filter(post__group_id=group_id), 'updated_at'),
+        (Tombstone.objects.filter(
+            Q(kind__in=(Tombstone.POST, Tombstone.MOVED), group_id=group_id)
+            | Q(kind=Tombstone.COMMENT, post_id__in=posts.values('pk'))),
+         'deleted_at'),
+    ], [f'group:{group_id}'])
+
+
+def profile_validators(author_id):
+    posts = Post.objects.filter(author_id=author_id)
+    return Validators([
+        (posts, 'updated_at'),
+        (Comment.objects.filter(post__author_id=author_id), 'updated_at'),
+        (Tombstone.objects.filter(
+            Q(kind=Tombstone.POST, author_id=author_id)
+            | Q(kind=Tombstone.COMMENT, post_id__in=posts.values('pk'))
+            | Q(kind=Tombstone.FOLLOW, author_id=author_id)
+            | Q(kind=Tombstone.FOLLOW, user_id=author_id)),
+         'deleted_at'),
+        (Follow.objects.filter(Q(author_id=author_id)
+                               | Q(user_id=author_id)), 'created'),
+    ], [f'author:{author_id}'])
+
+
+def profile_querysets(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    return profile_validators(author_id)
+
+
+def post_validators(post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id').first()
+    tags = [f'post:{post_id}']
+    if post is not None:
+        tags = post_tags(post_id, *post)[1:]
+    return Validators([
+        (Post.objects.filter(pk=post_id), 'updated_at'),
+        (Comment.objects.filter(post_id=post_id), 'updated_at'),
+        _tombstones(kind=Tombstone.COMMENT, post_id=post_id),
+    ], tags)
+
+
+def post_querysets(request, username, post_id):
+    return post_validators(post_id)
+
+
+# в ленте подписок комментарии не учитываются датами: их пришлось бы
+# искать по всем постам ленты. Их меняют версии тегов авторов
+def follow_querysets(request):
+    user = request.user
+    following = social.following_ids(user)
+    return Validators([
+        (timeline.timeline_posts(user), 'updated_at'),
+        (Tombstone.objects.filter(
+            Q(kind=Tombstone.POST, author_id__in=following)
+            | Q(kind__in=(Tombstone.FOLLOW, Tombstone.MOVED),
+                user_id=user.pk)),
+         'deleted_at'),
+        (Follow.objects.filter(user=user), 'created'),
+    ], [f'follower:{user.pk}']
+        + [f'author:{author_id}' for author_id in sorted(following)])
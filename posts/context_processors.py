@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+# подписка страниц на поток событий, см. EVENTS_ENABLED
+def live_updates(request):
+    return {'live_updates': settings.EVENTS_ENABLED}
@@ -0,0 +1,135 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import (EmptyPage, Page, PageNotAnInteger,
+                                   Paginator)
+from django.db import connections
+from django.db.models import F
+from django.utils.functional import cached_property
+
+from .models import Group
+
+# Число записей для паджинатора без COUNT(*) на каждый запрос. Для
+# профиля и группы есть счетчики UserStats.posts_count и Group.posts_count,
+# их обновляют сигналы создания и удаления постов. Для остальных лент на
+# PostgreSQL берется оценка планировщика, точный COUNT делается только
+# ниже EXACT_COUNT_THRESHOLD. На других СУБД точное число кешируется
+# до следующего создания или удаления поста.
+#
+# Оценка может быть меньше настоящего числа записей, поэтому при
+# приблизительном счетчике номера страниц за num_pages допустимы, а есть
+# ли следующая страница, решает выборка из per_page + 1 записей.
+
+COUNTS_TAG = 'posts:counts'
+
+
+def bump_group_posts(group_id, delta):
+    if group_id is None:
+        return
+    queryset = Group.objects.filter(pk=group_id)
+    if delta < 0:
+        queryset = queryset.filter(posts_count__gte=-delta)
+    queryset.update(posts_count=F('posts_count') + delta)
+
+
+def invalidate():
+    cache.invalidate_tags(COUNTS_TAG)
+
+
+def planner_estimate(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def cached_count(queryset):
+    query = str(queryset.order_by().query)
+    key = 'posts:count:' + hashlib.md5(query.encode()).hexdigest()
+    return cache.get_or_set(key, queryset.count,
+                            settings.POSTS_COUNT_CACHE_TIMEOUT,
+                            tags=[COUNTS_TAG])
+
+
+# (число записей, приблизительное ли оно)
+def approximate_count(queryset):
+    estimate = planner_estimate(queryset)
+    if estimate is None:
+        return cached_count(queryset), False
+    if estimate >= settings.EXACT_COUNT_THRESHOLD:
+        return estimate, True
+    return queryset.count(), False
+
+
+class ApproximatePage(Page):
+    """Страница, у которой наличие следующей известно по выборке."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1
+
+
+class CountedPaginator(Paginator):
+    """Paginator со счетчиком или оценкой вместо COUNT(*)."""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._known_count = count
+
+    @cached_property
+    def _count(self):
+        if self._known_count is not None:
+            return self._known_count, False
+        return approximate_count(self.object_list)
+
+    @cached_property
+    def count(self):
+        return self._count[0]
+
+    @property
+    def count_is_approximate(self):
+        return self._count[1]
+
+    def validate_number(self, number):
+        if not self.count_is_approximate:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return super().validate_number(number)
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_approximate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('На этой странице нет записей')
+        return ApproximatePage(rows[:self.per_page], number, self,
+                               len(rows) > self.per_page)
+
+    def get_page(self, number):
+        if not self.count_is_approximate:
+            return super().get_page(number)
+        try:
+            return self.page(number)
+        except (EmptyPage, PageNotAnInteger):
+            return self.page(1)
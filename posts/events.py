@@ -0,0 +1,196 @@
+import asyncio
+import itertools
+import json
+import re
+import threading
+from collections import deque, namedtuple
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+
+# События для открытых страниц (Server-Sent Events): "новый пост в группе"
+# и "новый комментарий к посту". Сигналы сохранения публикуют их после
+# коммита в брокер внутри процесса; подписчик получает события своих
+# каналов: posts (все новые посты), group:<slug> и post:<id>. Брокер
+# помнит последние EVENTS_BACKLOG событий, переподключившийся клиент
+# присылает Last-Event-ID и получает пропущенное.
+#
+# Брокер живет в памяти процесса: поток событий и запись постов должны
+# обслуживаться одним процессом (yatube.asgi). При нескольких процессах
+# его заменяет pub/sub внешнего брокера с тем же интерфейсом.
+#
+# Поток обслуживает asgi_stream() в yatube.asgi: ожидающее соединение -
+# это корутина, а не занятый поток. Под WSGI каждое соединение держало бы
+# воркер, поэтому там страницы не подписываются (EVENTS_ENABLED), а вью
+# отвечает 204.
+
+CHANNEL_RE = re.compile(r'^(posts|group:[-\w]+|post:\d+)$')
+HEADERS = (
+    ('Content-Type', 'text/event-stream; charset=utf-8'),
+    ('Cache-Control', 'no-cache'),
+    ('X-Accel-Buffering', 'no'),
+)
+PING = b': ping\n\n'
+
+Event = namedtuple('Event', 'id name data channels')
+
+
+class Broker:
+    """Подписки на каналы событий внутри процесса."""
+
+    def __init__(self, backlog):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._backlog = deque(maxlen=backlog)
+        self._ids = itertools.count(1)
+
+    # deliver вызывается в потоке публикации и не должен блокироваться.
+    # Возвращает ключ подписки и пропущенные после last_id события
+    def subscribe(self, channels, deliver, last_id=None):
+        channels = frozenset(channels)
+        token = object()
+        with self._lock:
+            self._subscribers[token] = (channels, deliver)
+            missed = []
+            if last_id is not None:
+                missed = [event for event in self._backlog
+                          if event.id > last_id and event.channels & channels]
+        return token, missed
+
+    def unsubscribe(self, token):
+        with self._lock:
+            self._subscribers.pop(token, None)
+
+    def publish(self, channels, name, data):
+        with self._lock:
+            event = Event(next(self._ids), name, data, frozenset(channels))
+            self._backlog.append(event)
+            targets = [deliver
+                       for subscribed, deliver in self._subscribers.values()
+                       if subscribed & event.channels]
+        for deliver in targets:
+            deliver(event)
+        return event
+
+    def subscribers_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+broker = Broker(settings.EVENTS_BACKLOG)
+
+
+def format_event(event):
+    return (f'id: {event.id}\nevent: {event.name}\n'
+            f'data: {json.dumps(event.data)}\n\n').encode()
+
+
+def retry_line():
+    return f'retry: {settings.EVENTS_RETRY}\n\n'.encode()
+
+
+# каналы из ?channel=...; неизвестные отбрасываются, по умолчанию posts
+def parse_channels(values):
+    channels = [value for value in values if CHANNEL_RE.match(value)]
+    return channels[:settings.EVENTS_MAX_CHANNELS] or ['posts']
+
+
+def parse_last_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# публикация после коммита: событие не должно опережать данные в базе
+def publish_on_commit(channels, name, data):
+    transaction.on_commit(lambda: broker.publish(channels, name, data))
+
+
+def publish_post(post):
+    channels = ['posts']
+    group_slug = None
+    if post.group_id is not None:
+        group_slug = post.group.slug
+        channels.append(f'group:{group_slug}')
+    publish_on_commit(channels, 'post', {
+        'id': post.pk,
+        'author': post.author.username,
+        'group': group_slug,
+        'url': reverse('post', args=[post.author.username, post.pk]),
+    })
+
+
+def publish_comment(comment):
+    publish_on_commit([f'post:{comment.post_id}'], 'comment', {
+        'id': comment.pk,
+        'post': comment.post_id,
+        'author': comment.author.username,
+    })
+
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+def _offer(inbox, event):
+    try:
+        inbox.put_nowait(event)
+    except asyncio.QueueFull:
+        pass
+
+
+# поток для ASGI: соединение держится, пока клиент не отключится
+async def asgi_stream(scope, receive, send):
+    params = parse_qs(scope['query_string'].decode('latin-1'))
+    headers = dict(scope['headers'])
+    channels = parse_channels(params.get('channel', []))
+    last_id = parse_last_id(headers.get(b'last-event-id', b'').decode(
+        'latin-1') or params.get('lastEventId', [None])[0])
+
+    loop = asyncio.get_running_loop()
+    inbox = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def deliver(event):
+        try:
+            loop.call_soon_threadsafe(_offer, inbox, event)
+        except RuntimeError:
+            # цикл событий уже закрыт
+            pass
+
+    token, missed = broker.subscribe(channels, deliver, last_id)
+    disconnect = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(name.lower().encode(), value.encode())
+                        for name, value in HEADERS],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': retry_line() + b''.join(map(format_event, missed)),
+            'more_body': True,
+        })
+        while not disconnect.done():
+            getter = asyncio.ensure_future(inbox.get())
+            done, _ = await asyncio.wait(
+                {getter, disconnect}, timeout=settings.EVENTS_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                chunk = format_event(getter.result())
+            else:
+                getter.cancel()
+                if disconnect.done():
+                    break
+                chunk = PING
+            await send({'type': 'http.response.body', 'body': chunk,
+                        'more_body': True})
+    finally:
+        broker.unsubscribe(token)
+        disconnect.cancel()
@@ -0,0 +1,37 @@
+from . import timeline
+from .models import Post
+
+# Выборки лент постов. Ими пользуются и HTML-страницы, и JSON API, чтобы
+# обе стороны читали одни и те же индексы и подтягивали автора и группу
+# одним запросом.
+
+
+def _with_relations(queryset):
+    return queryset.select_related('group', 'author')
+
+
+def index_posts():
+    return _with_relations(Post.objects.all())
+
+
+def group_posts(group):
+    return _with_relations(group.posts.all())
+
+
+def author_posts(author):
+    return _with_relations(author.posts.all())
+
+
+def follow_posts(user):
+    return _with_relations(timeline.timeline_posts(user))
+
+
+# лента подписок листается слиянием TimelineEntry и постов авторов
+# без раскладки, см. timeline.TimelinePaginator
+def follow_paginator(user, per_page):
+    return timeline.TimelinePaginator(user, per_page,
+                                      _with_relations(Post.objects.all()))
+
+
+def post_comments(post):
+    return post.comments.select_related('author')
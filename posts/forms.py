@@ -1,12 +1,88 @@
+import os
+from io import BytesIO
+
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
 from django.forms import Textarea
+from PIL import Image, ImageOps
+
 from .models import Comment, Post
 
 
+class PostImageField(forms.ImageField):
+    default_error_messages = {
+        'too_large': 'Файл слишком большой. Максимум %(limit)s МБ.',
+        'too_many_pixels': 'Картинка слишком большая: %(width)s×%(height)s.',
+    }
+
+    def to_python(self, data):
+        if data in self.empty_values:
+            return None
+        if getattr(data, 'oversized', False):
+            raise forms.ValidationError(
+                self.error_messages['too_large'], code='too_large',
+                params={'limit': settings.POST_IMAGE_MAX_UPLOAD_SIZE
+                        // (1024 * 1024)})
+        # Image.open читает только заголовок, пиксели не декодируются
+        try:
+            width, height = Image.open(data).size
+        except Exception:
+            width = height = 0
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                self.error_messages['too_many_pixels'],
+                code='too_many_pixels',
+                params={'width': width, 'height': height})
+        if hasattr(data, 'seek'):
+            data.seek(0)
+        return super().to_python(data)
+
+
+# уменьшает слишком большую картинку и убирает из нее EXIF
+def normalize_image(upload):
+    image = Image.open(upload)
+    if getattr(image, 'is_animated', False):
+        return upload
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    has_exif = bool(image.info.get('exif'))
+    if max(image.size) <= max_side and not has_exif:
+        upload.seek(0)
+        return upload
+
+    image_format = image.format
+    name = os.path.basename(upload.name)
+    content_type = upload.content_type
+    # форматы, которые Pillow только читает, пересохраняются в PNG,
+    # если есть прозрачность, иначе в JPEG
+    Image.init()
+    if image_format not in Image.SAVE:
+        has_alpha = (image.mode in ('RGBA', 'LA', 'PA')
+                     or 'transparency' in image.info)
+        image_format = 'PNG' if has_alpha else 'JPEG'
+        name = os.path.splitext(name)[0] + (
+            '.png' if has_alpha else '.jpg')
+        content_type = Image.MIME[image_format]
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=settings.POST_IMAGE_QUALITY)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type)
+
+
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {'image': PostImageField}
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            image = normalize_image(image)
+        return image
 
     def clean_text(self):
         data = self.cleaned_data['text']
@@ -0,0 +1,110 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+# Кеш отрисованных карточек posts/post_item.html. Карточка отличается только
+# ссылкой "Редактировать" для автора, поэтому на пост приходится два ключа.
+# Обе карточки помечены тегами поста, его автора и группы и сбрасываются
+# по тегу.
+# Версии тегов снимаются до отрисовки: сброс во время отрисовки не дает
+# сохранить устаревшую карточку.
+
+
+def fragment_key(post_id, is_owner):
+    return (f'post_item:{settings.POST_FRAGMENT_VERSION}:'
+            f'{post_id}:{int(is_owner)}')
+
+
+def post_tag(post_id):
+    return f'post:{post_id}'
+
+
+def group_tag(group_id):
+    return f'group:{group_id}'
+
+
+def author_tag(author_id):
+    return f'author:{author_id}'
+
+
+def post_tags(post):
+    tags = [post_tag(post.pk), author_tag(post.author_id)]
+    if post.group_id is not None:
+        tags.append(group_tag(post.group_id))
+    return tags
+
+
+def invalidate(*post_ids):
+    cache.invalidate_tags(*map(post_tag, post_ids))
+
+
+def invalidate_group(group_id):
+    cache.invalidate_tags(group_tag(group_id))
+
+
+def invalidate_author(author_id):
+    cache.invalidate_tags(author_tag(author_id))
+
+
+# Кеш ленты целиком: страница (номер или курсор) вместе с паджинатором.
+# Общий вариант отдается всем, кто не автор ни одного поста на странице,
+# автору - его собственный вариант со ссылками "Редактировать". Записи
+# помечены тегом ленты и тегами постов страницы, поэтому сбрасываются
+# при создании, изменении и удалении поста, комментарии и смене группы.
+def feed_tag(name):
+    return f'feed:{name}'
+
+
+def invalidate_feeds(*names):
+    cache.invalidate_tags(*map(feed_tag, names))
+
+
+def feed_key(name, request, page, user):
+    position = '{}:{}'.format(request.GET.get('page', ''),
+                              request.GET.get('cursor', ''))
+    digest = hashlib.md5(position.encode()).hexdigest()
+    owner_id = getattr(user, 'pk', None)
+    if owner_id is None or all(post.author_id != owner_id
+                               for post in page):
+        owner_id = 0
+    return f'feed:{settings.POST_FRAGMENT_VERSION}:{name}:{digest}:{owner_id}'
+
+
+def render_feed(name, request, page, user, render):
+    key = feed_key(name, request, page, user)
+    html = cache.get(key)
+    if html is None:
+        tags = [feed_tag(name)]
+        for post in page:
+            tags.extend(post_tags(post))
+        versions = cache.tag_versions(*tags)
+        html = render()
+        cache.set(key, html, settings.FEED_CACHE_TIMEOUT, tags=versions)
+    return html
+
+
+# отрисовка карточек страницы: все ключи читаются одним get_many,
+# отрисованные заново пишутся одним set_many
+def render_post_items(posts, user):
+    user_id = getattr(user, 'pk', None)
+    keys = [fragment_key(post.pk, post.author_id == user_id)
+            for post in posts]
+    cached = cache.get_many(keys)
+    missing = [post for post, key in zip(posts, keys) if key not in cached]
+    versions = cache.tag_versions(
+        *{tag for post in missing for tag in post_tags(post)})
+    parts, rendered, key_tags = [], {}, {}
+    for post, key in zip(posts, keys):
+        html = cached.get(key)
+        if html is None:
+            html = render_to_string('posts/post_item.html',
+                                    {'post': post, 'user': user})
+            rendered[key] = html
+            key_tags[key] = {tag: versions[tag] for tag in post_tags(post)}
+        parts.append(html)
+    if rendered:
+        cache.set_many(rendered, settings.POST_FRAGMENT_TIMEOUT,
+                       key_tags=key_tags)
+    return ''.join(parts)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import sync
+
+
+class Command(BaseCommand):
+    help = 'Удаляет следы удалений старше SYNC_TOMBSTONE_TTL'
+
+    def handle(self, *args, **options):
+        deleted = sync.prune()
+        self.stdout.write(f'Удалено следов: {deleted}')
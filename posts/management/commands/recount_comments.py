@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts import conditional, fragments
+from posts.models import Comment, Post
+from yatube import pagecache
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает Post.comments_count по таблице комментариев'
+
+    def handle(self, *args, **options):
+        counts = Comment.objects.filter(
+            post=OuterRef('pk')
+        ).order_by().values('post').annotate(
+            total=Count('pk')
+        ).values('total')
+        total = Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+        # UPDATE без сигналов: закешированные карточки, ленты, страницы
+        # и ETag постов с исправленным счетчиком сбрасываются здесь
+        changed = list(Post.objects.annotate(total=total).exclude(
+            comments_count=F('total')).values_list(
+                'pk', 'author_id', 'group_id'))
+        if changed:
+            post_ids = [post_id for post_id, _, _ in changed]
+            Post.objects.filter(pk__in=post_ids).update(
+                comments_count=total)
+            fragments.invalidate(*post_ids)
+            fragments.invalidate_feeds('index')
+            pagecache.purge(*(f'post:{post_id}' for post_id in post_ids))
+            tags = set()
+            for post in changed:
+                tags.update(conditional.post_tags(*post))
+            conditional.bump_version(*tags)
+        self.stdout.write(f'Пересчитано постов: {len(changed)}')
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Нарезает варианты картинок для уже опубликованных постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='пересоздать и уже готовые варианты')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['force']:
+            posts = posts.filter(image_variants='')
+        image_names = posts.order_by().values_list(
+            'image', flat=True).distinct()
+
+        created = 0
+        for image_name in list(image_names):
+            try:
+                thumbnails.generate(image_name,
+                                    force=options['force'])
+            except Exception as error:
+                self.stderr.write(f'{image_name}: {error}')
+                continue
+            created += 1
+        self.stdout.write(f'Нарезано картинок: {created}')
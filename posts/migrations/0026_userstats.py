@@ -0,0 +1,39 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    stats = {}
+    for user_id, author_id in Follow.objects.values_list('user_id',
+                                                         'author_id'):
+        stats.setdefault(author_id, UserStats(user_id=author_id))
+        stats[author_id].followers_count += 1
+        if user_id is not None:
+            stats.setdefault(user_id, UserStats(user_id=user_id))
+            stats[user_id].following_count += 1
+    UserStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0025_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='подписок')),
+            ],
+        ),
+        migrations.RunPython(count_follows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+def remove_duplicates(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    duplicates = Follow.objects.values('user', 'author').annotate(
+        first=models.Min('pk'), total=models.Count('pk')
+    ).filter(total__gt=1)
+    removed = 0
+    for row in duplicates:
+        removed += Follow.objects.filter(
+            user=row['user'], author=row['author']
+        ).exclude(pk=row['first']).delete()[0]
+    if not removed:
+        return
+    # счетчики UserStats считались с учетом дублей
+    for stats in UserStats.objects.all():
+        stats.followers_count = Follow.objects.filter(
+            author_id=stats.user_id).count()
+        stats.following_count = Follow.objects.filter(
+            user_id=stats.user_id).count()
+        stats.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0026_userstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='follow_author_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
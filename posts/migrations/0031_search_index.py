@@ -0,0 +1,60 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from posts.search import KINDS, normalize
+
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for table in ('posts_post', 'posts_comment'):
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {table}_text_search_idx '
+                f"ON {table} USING gin (to_tsvector('russian', text))")
+        return
+    if connection.vendor != 'sqlite':
+        return
+
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5('
+        'body, kind UNINDEXED, post_id UNINDEXED, '
+        "tokenize = 'unicode61 remove_diacritics 0')")
+
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Group = apps.get_model('posts', 'Group')
+    rows = []
+    for pk, text in Post.objects.values_list('pk', 'text').iterator():
+        rows.append((pk * len(KINDS) + KINDS['post'], normalize(text),
+                     'post', pk))
+    for pk, post_id, text in Comment.objects.values_list(
+            'pk', 'post_id', 'text').iterator():
+        rows.append((pk * len(KINDS) + KINDS['comment'], normalize(text),
+                     'comment', post_id))
+    for pk, title in Group.objects.values_list('pk', 'title').iterator():
+        rows.append((pk * len(KINDS) + KINDS['group'], normalize(title),
+                     'group', None))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO posts_search (rowid, body, kind, post_id) '
+            'VALUES (%s, %s, %s, %s)', rows)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for table in ('posts_post', 'posts_comment'):
+            schema_editor.execute(
+                f'DROP INDEX IF EXISTS {table}_text_search_idx')
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0030_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:31
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_posts(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    UserStats = apps.get_model('posts', 'UserStats')
+    for group_id, posts_count in Post.objects.filter(
+            group__isnull=False).values_list('group').annotate(
+                posts_count=Count('pk')).order_by():
+        Group.objects.filter(pk=group_id).update(posts_count=posts_count)
+    authors = dict(Post.objects.values_list('author').annotate(
+        posts_count=Count('pk')).order_by())
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=author_id) for author_id in authors],
+        batch_size=500, ignore_conflicts=True,
+    )
+    for author_id, posts_count in authors.items():
+        UserStats.objects.filter(user_id=author_id).update(
+            posts_count=posts_count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0031_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='записей'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='записей'),
+        ),
+        migrations.RunPython(count_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:35
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+# старые записи считаются не менявшимися с момента публикации
+def fill_updated_at(apps, schema_editor):
+    apps.get_model('posts', 'Post').objects.update(updated_at=F('pub_date'))
+    apps.get_model('posts', 'Comment').objects.update(
+        updated_at=F('created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0033_comment_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'запись'), ('comment', 'комментарий'), ('follow', 'подписка')], max_length=10, verbose_name='тип')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id объекта')),
+                ('author_id', models.PositiveIntegerField(null=True)),
+                ('group_id', models.PositiveIntegerField(null=True)),
+                ('post_id', models.PositiveIntegerField(null=True)),
+                ('user_id', models.PositiveIntegerField(null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='удален')),
+            ],
+            options={
+                'ordering': ['deleted_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='изменен'),
+        ),
+        migrations.AddField(
+            model_name='follow',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='дата подписки'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='изменен'),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0034_sync'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tombstone',
+            name='kind',
+            field=models.CharField(choices=[('post', 'запись'), ('comment', 'комментарий'), ('follow', 'подписка'), ('moved', 'запись ушла из области')], max_length=10, verbose_name='тип'),
+        ),
+    ]
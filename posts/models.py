@@ -1,10 +1,33 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import post_image_storage
+
 User = get_user_model()
 
 
-class Group(models.Model):
+# Счетчики меняют только сигналы атомарным UPDATE ... F(). Полное
+# сохранение уже загруженного объекта (форма, админка) их не пишет,
+# иначе вернуло бы в базу значение, прочитанное до чужих изменений.
+class KeepCountersMixin:
+    COUNTER_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args
+                and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS]
+        super().save(*args, **kwargs)
+
+
+class Group(KeepCountersMixin, models.Model):
+    COUNTER_FIELDS = ('posts_count',)
+
     title = models.CharField('Заголовок',
                              max_length=200,
                              help_text='задайте заголовок')
@@ -12,12 +35,15 @@ class Group(models.Model):
     description = models.TextField('Описание', max_length=400,
                                    help_text='описание группы. '
                                              'Не более 400 символов')
+    posts_count = models.PositiveIntegerField('записей', default=0,
+                                              editable=False)
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class Post(KeepCountersMixin, models.Model):
+    COUNTER_FIELDS = ('comments_count',)
     text = models.TextField('Текст',
                             help_text='здесь можно писать свою историю')
     pub_date = models.DateTimeField('дата публикации',
@@ -34,14 +60,37 @@ class Post(models.Model):
                               verbose_name='сообщество',
 
                               help_text='здесь указано сообщество поста')
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # картинки хранятся по хешу содержимого, одинаковые - в одном файле
+    image = models.ImageField(upload_to='posts/', blank=True, null=True,
+                              storage=post_image_storage, db_index=True)
+    # размеры картинки для srcset, заполняет posts.thumbnails
+    image_variants = models.TextField('варианты картинки', blank=True,
+                                      default='', editable=False)
+    comments_count = models.PositiveIntegerField('число комментариев',
+                                                 default=0, editable=False)
+    # время последнего изменения, по нему клиенты забирают изменения
+    updated_at = models.DateTimeField('изменен', auto_now=True,
+                                      db_index=True)
 
     class Meta:
         ordering = ['-pub_date']
+        # индексы лент: главная, профиль автора и страница группы
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def variants(self):
+        return json.loads(self.image_variants) if self.image_variants else []
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, blank=False, null=False,
@@ -52,9 +101,15 @@ class Comment(models.Model):
                                related_name='comments')
     text = models.TextField('комментарий')
     created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField('изменен', auto_now=True,
+                                      db_index=True)
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text
@@ -66,3 +121,79 @@ class Follow(models.Model):
                              related_name='follower')
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='following')
+    created = models.DateTimeField('дата подписки', auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    # копия post.pub_date, чтобы лента читалась одним диапазоном индекса
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счетчики пользователя."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats')
+    followers_count = models.PositiveIntegerField('подписчиков', default=0)
+    following_count = models.PositiveIntegerField('подписок', default=0)
+    posts_count = models.PositiveIntegerField('записей', default=0)
+
+
+class Tombstone(models.Model):
+    """След удаленного поста, комментария или подписки.
+
+    Нужен клиентам синхронизации: удаленный объект уже нельзя найти
+    по updated_at. След moved - пост ушел из группы (group_id) или из
+    ленты подписок (user_id) и для этой области считается удаленным.
+    Ссылки хранятся числами, без внешних ключей.
+    """
+    POST = 'post'
+    COMMENT = 'comment'
+    FOLLOW = 'follow'
+    MOVED = 'moved'
+    KINDS = (
+        (POST, 'запись'),
+        (COMMENT, 'комментарий'),
+        (FOLLOW, 'подписка'),
+        (MOVED, 'запись ушла из области'),
+    )
+    kind = models.CharField('тип', max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField('id объекта')
+    # автор поста или автор, от которого отписались
+    author_id = models.PositiveIntegerField(null=True)
+    group_id = models.PositiveIntegerField(null=True)
+    # пост удаленного комментария
+    post_id = models.PositiveIntegerField(null=True)
+    # подписчик удаленной подписки
+    user_id = models.PositiveIntegerField(null=True)
+    deleted_at = models.DateTimeField('удален', auto_now_add=True,
+                                      db_index=True)
+
+    class Meta:
+        ordering = ['deleted_at']
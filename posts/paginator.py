@@ -0,0 +1,155 @@
+import base64
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+# курсор кодируется в непрозрачную для клиента строку
+def encode_cursor(values, reverse=False):
+    payload = json.dumps({'v': values, 'r': int(reverse)},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padding = '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(token + padding))
+        return list(data['v']), bool(data['r'])
+    except (ValueError, TypeError, KeyError):
+        return None, False
+
+
+class KeysetPage(Sequence):
+    """Страница ленты без номера и без общего числа записей."""
+
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @cached_property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1])
+
+    @cached_property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.cursor_for(self.object_list[0], reverse=True)
+
+
+class KeysetPaginator:
+    """Паджинатор по ключу (по умолчанию (pub_date, id)).
+
+    Вместо COUNT(*) и OFFSET выбирает per_page + 1 записей после курсора,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    Поля ordering должны однозначно упорядочивать записи и идти
+    в одном направлении.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+
+    @cached_property
+    def count(self):
+        return self.object_list.count()
+
+    def cursor_for(self, obj, reverse=False):
+        values = []
+        for field in self.fields:
+            value = getattr(obj, field)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        return encode_cursor(values, reverse)
+
+    # значения курсора приходят от клиента: все, что поле не принимает,
+    # считается испорченным курсором, и лента открывается с начала
+    def _parse_values(self, values):
+        if len(values) != len(self.fields):
+            return None
+        model = self.object_list.model
+        parsed = []
+        for field, value in zip(self.fields, values):
+            if value is None or isinstance(value, (list, dict)):
+                return None
+            try:
+                value = model._meta.get_field(field).to_python(value)
+            except (ValueError, TypeError, ValidationError):
+                return None
+            if value is None:
+                return None
+            if hasattr(value, 'tzinfo') and timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            parsed.append(value)
+        return parsed
+
+    def _after(self, values, forward):
+        # условие (a, b) < (x, y) в виде, понятном любой СУБД:
+        # a < x OR (a = x AND b < y)
+        lookup = 'lt' if forward == self.descending else 'gt'
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            step = Q(**{f'{field}__{lookup}': values[i]})
+            for prev_field, prev_value in zip(self.fields[:i], values[:i]):
+                step &= Q(**{prev_field: prev_value})
+            condition |= step
+        return condition
+
+    def get_page(self, cursor=None):
+        values, reverse = decode_cursor(cursor) if cursor else (None, False)
+        if values is not None:
+            values = self._parse_values(values)
+        if values is None:
+            reverse = False
+
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._after(values, not reverse))
+        if reverse:
+            inverted = [field[1:] if field.startswith('-') else f'-{field}'
+                        for field in self.ordering]
+            queryset = queryset.order_by(*inverted)
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if reverse:
+            items.reverse()
+            return KeysetPage(items, self, True, has_more)
+        return KeysetPage(items, self, has_more, values is not None)
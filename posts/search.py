@@ -0,0 +1,161 @@
+import re
+
+import snowballstemmer
+from django.db import connection
+
+from .models import Group, Post
+from .paginator import KeysetPage, decode_cursor, encode_cursor
+
+# Полнотекстовый поиск по постам, комментариям и названиям групп.
+# На SQLite используется таблица FTS5 posts_search: в нее пишутся основы
+# слов (стеммер Snowball для русского языка), поэтому "котами" находит
+# "кот". Индекс обновляют сигналы сохранения и удаления. На PostgreSQL
+# запросы идут в to_tsvector('russian', ...) по GIN-индексам.
+
+TABLE = 'posts_search'
+KINDS = {'post': 0, 'comment': 1, 'group': 2}
+WORD_RE = re.compile(r'\w+')
+
+_stemmer = snowballstemmer.stemmer('russian')
+
+
+def normalize(text):
+    words = WORD_RE.findall((text or '').lower().replace('ё', 'е'))
+    return ' '.join(_stemmer.stemWords(words))
+
+
+def _match_expression(query):
+    stems = normalize(query).split()
+    return ' '.join('"{}"*'.format(stem.replace('"', '""'))
+                    for stem in stems)
+
+
+def uses_fts():
+    return connection.vendor == 'sqlite'
+
+
+def _rowid(kind, object_id):
+    return object_id * len(KINDS) + KINDS[kind]
+
+
+def index(kind, object_id, post_id, text):
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s',
+                       [_rowid(kind, object_id)])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, body, kind, post_id) '
+            'VALUES (%s, %s, %s, %s)',
+            [_rowid(kind, object_id), normalize(text), kind, post_id])
+
+
+def unindex(kind, object_id):
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s',
+                       [_rowid(kind, object_id)])
+
+
+def _post_hits_sql():
+    if uses_fts():
+        # LIMIT -1 не дает SQLite развернуть подзапрос: bm25() нельзя
+        # вызывать внутри агрегирующего запроса
+        return (
+            f'SELECT post_id, bm25({TABLE}) AS score FROM {TABLE} '
+            f"WHERE {TABLE} MATCH %s AND kind IN ('post', 'comment') "
+            'LIMIT -1'
+        ), 1
+    return (
+        "SELECT id AS post_id, -ts_rank(to_tsvector('russian', text), q) "
+        "AS score FROM posts_post, plainto_tsquery('russian', %s) q "
+        "WHERE to_tsvector('russian', text) @@ q "
+        "UNION ALL "
+        "SELECT post_id, -ts_rank(to_tsvector('russian', text), q) "
+        "FROM posts_comment, plainto_tsquery('russian', %s) q "
+        "WHERE to_tsvector('russian', text) @@ q"
+    ), 2
+
+
+def _query_param(query):
+    return _match_expression(query) if uses_fts() else query
+
+
+# id постов и их оценки; чем меньше оценка, тем выше пост в выдаче
+def ranked_post_ids(query, after=None, limit=10):
+    param = _query_param(query)
+    if not param:
+        return []
+    hits_sql, placeholders = _post_hits_sql()
+    params = [param] * placeholders
+    having = ''
+    if after is not None:
+        having = ('HAVING MIN(score) > %s '
+                  'OR (MIN(score) = %s AND post_id > %s) ')
+        params += [after[0], after[0], after[1]]
+    sql = (f'SELECT post_id, MIN(score) FROM ({hits_sql}) hits '
+           f'GROUP BY post_id {having}'
+           'ORDER BY MIN(score), post_id LIMIT %s')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        return cursor.fetchall()
+
+
+def search_groups(query, limit=5):
+    param = _query_param(query)
+    if not param:
+        return Group.objects.none()
+    if uses_fts():
+        sql = (f'SELECT rowid FROM {TABLE} '
+               f"WHERE {TABLE} MATCH %s AND kind = 'group' "
+               'ORDER BY rank LIMIT %s')
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [param, limit])
+            ids = [(rowid - KINDS['group']) // len(KINDS)
+                   for rowid, in cursor.fetchall()]
+        return Group.objects.filter(pk__in=ids)
+    from django.contrib.postgres.search import SearchQuery, SearchVector
+    return Group.objects.annotate(
+        search=SearchVector('title', config='russian')
+    ).filter(search=SearchQuery(query, config='russian'))[:limit]
+
+
+class SearchPaginator:
+    """Выдача поиска по ключу (оценка, id поста), только вперед."""
+
+    def __init__(self, query, per_page):
+        self.query = query
+        self.per_page = per_page
+
+    def cursor_for(self, post, reverse=False):
+        return encode_cursor([post.search_score, post.pk], reverse)
+
+    # курсор приходит от клиента и идет в SQL параметрами: принимаются
+    # только оценка-число и целый id
+    @staticmethod
+    def _parse_cursor(cursor):
+        values, _ = decode_cursor(cursor)
+        if values is None or len(values) != 2:
+            return None
+        score, post_id = values
+        if (isinstance(score, bool) or not isinstance(score, (int, float))
+                or isinstance(post_id, bool)
+                or not isinstance(post_id, int)):
+            return None
+        return values
+
+    def get_page(self, cursor=None):
+        after = self._parse_cursor(cursor) if cursor else None
+        hits = ranked_post_ids(self.query, after, self.per_page + 1)
+        has_next = len(hits) > self.per_page
+        hits = hits[:self.per_page]
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for post_id, _ in hits])
+        items = []
+        for post_id, score in hits:
+            post = posts.get(post_id)
+            if post is not None:
+                post.search_score = score
+                items.append(post)
+        return KeysetPage(items, self, has_next, False)
@@ -0,0 +1,304 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from yatube import pagecache
+
+from . import (conditional, counts, events, fragments, search, social,
+               sync, thumbnails, timeline)
+from .models import Comment, Follow, Group, Post, Tombstone, User
+from .storage import post_image_storage
+
+
+@receiver([post_save, post_delete], sender=Post)
+def post_changed(sender, instance, **kwargs):
+    fragments.invalidate(instance.pk)
+    fragments.invalidate_feeds('index')
+
+
+# счетчик комментариев меняется одним UPDATE, без чтения строки поста.
+# post_delete приходит и при массовом удалении из админки.
+# Обработчики счетчика подключены раньше сброса кеша карточки
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(
+        comments_count=F('comments_count') - 1)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    fragments.invalidate(instance.post_id)
+
+
+# удаление группы обнуляет group у ее постов UPDATE без сигналов Post
+@receiver([post_save, post_delete], sender=Group)
+def group_changed(sender, instance, **kwargs):
+    fragments.invalidate_group(instance.pk)
+
+
+# имя автора есть в карточках его постов. Вход пользователя сохраняет
+# только last_login и имя не сравнивает
+@receiver(pre_save, sender=User)
+def remember_old_name(sender, instance, update_fields=None, **kwargs):
+    instance._old_name = None
+    if instance.pk is None or (
+            update_fields is not None
+            and not {'first_name', 'last_name'} & set(update_fields)):
+        return
+    instance._old_name = User.objects.filter(pk=instance.pk).values_list(
+        'first_name', 'last_name').first()
+
+
+@receiver(post_save, sender=User)
+def author_renamed(sender, instance, **kwargs):
+    old_name = getattr(instance, '_old_name', None)
+    if (old_name is not None
+            and old_name != (instance.first_name, instance.last_name)):
+        fragments.invalidate_author(instance.pk)
+        pagecache.purge(f'author:{instance.pk}', f'by-author:{instance.pk}')
+        group_ids = Post.objects.filter(author=instance).values_list(
+            'group_id', flat=True).distinct().order_by()
+        conditional.bump_version(
+            'index', f'author:{instance.pk}',
+            *(f'group:{group_id}' for group_id in group_ids
+              if group_id is not None))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        social.bump_counters('followers_count', [instance.author_id], 1)
+        social.bump_counters('following_count', [instance.user_id], 1)
+    social.invalidate([instance.user_id], [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    social.bump_counters('followers_count', [instance.author_id], -1)
+    social.bump_counters('following_count', [instance.user_id], -1)
+    social.invalidate([instance.user_id], [instance.author_id])
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.restore_fan_out(instance.author_id)
+
+
+# новый пост раскладывается по лентам подписчиков, откуда бы он ни
+# появился: из формы, админки или кода
+@receiver(post_save, sender=Post)
+def post_fanned_out(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+# версии тегов ETag страниц, на которых видна запись
+@receiver([post_save, post_delete], sender=Post)
+def post_version(sender, instance, **kwargs):
+    conditional.bump_post(instance.pk, instance.author_id, instance.group_id,
+                          getattr(instance, '_old_group_id', None))
+
+
+# число комментариев есть в карточке поста, в том числе в ленте подписок
+@receiver([post_save, post_delete], sender=Comment)
+def comment_version(sender, instance, **kwargs):
+    author_id = Post.objects.filter(pk=instance.post_id).values_list(
+        'author_id', flat=True).first()
+    tags = [f'post:{instance.post_id}']
+    if author_id is not None:
+        tags.append(f'author:{author_id}')
+    conditional.bump_version(*tags)
+
+
+# название группы есть в карточках ее постов на любых страницах
+@receiver([post_save, post_delete], sender=Group)
+def group_version(sender, instance, **kwargs):
+    author_ids = Post.objects.filter(group_id=instance.pk).values_list(
+        'author_id', flat=True).distinct().order_by()
+    conditional.bump_version(
+        'index', f'group:{instance.pk}',
+        *(f'author:{author_id}' for author_id in author_ids))
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def follow_version(sender, instance, **kwargs):
+    conditional.bump_follows(instance.user_id, instance.author_id)
+
+
+# счетчики записей автора и группы
+@receiver(post_save, sender=Post)
+def post_counted(sender, instance, created, **kwargs):
+    old_group_id = getattr(instance, '_old_group_id', None)
+    if created:
+        social.bump_counters('posts_count', [instance.author_id], 1)
+        counts.bump_group_posts(instance.group_id, 1)
+    elif old_group_id != instance.group_id:
+        counts.bump_group_posts(old_group_id, -1)
+        counts.bump_group_posts(instance.group_id, 1)
+    else:
+        return
+    counts.invalidate()
+
+
+@receiver(post_delete, sender=Post)
+def post_uncounted(sender, instance, **kwargs):
+    social.bump_counters('posts_count', [instance.author_id], -1)
+    counts.bump_group_posts(instance.group_id, -1)
+    counts.invalidate()
+
+
+# сброс закешированных страниц по суррогатным ключам
+@receiver([post_save, post_delete], sender=Post)
+def purge_post_pages(sender, instance, **kwargs):
+    keys = ['index', f'post:{instance.pk}', f'author:{instance.author_id}']
+    for group_id in {instance.group_id,
+                     getattr(instance, '_old_group_id', None)}:
+        if group_id is not None:
+            keys.append(f'group:{group_id}')
+    pagecache.purge(*keys)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def purge_comment_pages(sender, instance, **kwargs):
+    pagecache.purge(f'post:{instance.post_id}')
+
+
+@receiver([post_save, post_delete], sender=Group)
+def purge_group_pages(sender, instance, **kwargs):
+    pagecache.purge(f'group:{instance.pk}', f'in-group:{instance.pk}')
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def purge_follow_pages(sender, instance, **kwargs):
+    pagecache.purge(f'author:{instance.author_id}',
+                    f'author:{instance.user_id}')
+
+
+# файл картинки удаляется, когда на него не ссылается ни один пост.
+# Число ссылок считается по индексу Post.image под блокировкой
+# хранилища; ссылку, которая еще не закоммичена, страхует image_saved
+def release_image(image_name):
+    if not image_name:
+        return
+
+    def collect():
+        with post_image_storage.lock():
+            if Post.objects.filter(image=image_name).exists():
+                return
+            post_image_storage.delete(image_name)
+            thumbnails.delete_variants(image_name)
+
+    transaction.on_commit(collect)
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_state(sender, instance, **kwargs):
+    instance._old_image = instance._old_group_id = None
+    # загруженная картинка: после сохранения в ней остается содержимое
+    image = instance.image
+    instance._new_image = image if image and not image._committed else None
+    if instance.pk is not None:
+        old = Post.objects.filter(pk=instance.pk).values_list(
+            'image', 'group_id').first()
+        if old is not None:
+            instance._old_image, instance._old_group_id = old
+
+
+@receiver(post_save, sender=Post)
+def image_replaced(sender, instance, **kwargs):
+    old_image = getattr(instance, '_old_image', None)
+    if old_image and old_image != instance.image.name:
+        release_image(old_image)
+
+
+# картинка, уже лежавшая в хранилище, могла быть удалена сборщиком
+# между save() и коммитом поста: после коммита файл пишется заново
+@receiver(post_save, sender=Post)
+def image_saved(sender, instance, **kwargs):
+    image = getattr(instance, '_new_image', None)
+    if image is None:
+        return
+    name, content = image.name, image.file
+    transaction.on_commit(lambda: post_image_storage.restore(name, content))
+
+
+@receiver(post_delete, sender=Post)
+def image_deleted(sender, instance, **kwargs):
+    release_image(instance.image.name)
+
+
+# следы удалений для синхронизации клиентов
+@receiver(post_delete, sender=Post)
+def bury_post(sender, instance, **kwargs):
+    sync.bury(Tombstone.POST, instance.pk, author_id=instance.author_id,
+              group_id=instance.group_id)
+
+
+@receiver(post_delete, sender=Comment)
+def bury_comment(sender, instance, **kwargs):
+    sync.bury(Tombstone.COMMENT, instance.pk, post_id=instance.post_id)
+
+
+@receiver(post_delete, sender=Follow)
+def bury_follow(sender, instance, **kwargs):
+    sync.bury(Tombstone.FOLLOW, instance.pk, author_id=instance.author_id,
+              user_id=instance.user_id)
+    if instance.user_id is not None:
+        sync.leave_timeline(instance.user_id, instance.author_id)
+
+
+# пост, сменивший группу, уходит из области старой группы
+@receiver(post_save, sender=Post)
+def bury_moved_post(sender, instance, created, **kwargs):
+    old_group_id = getattr(instance, '_old_group_id', None)
+    if not created and old_group_id != instance.group_id:
+        sync.move_post(instance, old_group_id)
+
+
+# события для открытых страниц: новый пост и новый комментарий
+@receiver(post_save, sender=Post)
+def announce_post(sender, instance, created, **kwargs):
+    if created:
+        events.publish_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def announce_comment(sender, instance, created, **kwargs):
+    if created:
+        events.publish_comment(instance)
+
+
+# поисковый индекс
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index('post', instance.pk, instance.pk, instance.text)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    search.index('comment', instance.pk, instance.post_id, instance.text)
+
+
+@receiver(post_save, sender=Group)
+def index_group(sender, instance, **kwargs):
+    search.index('group', instance.pk, None, instance.title)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex('post', instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.unindex('comment', instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+def unindex_group(sender, instance, **kwargs):
+    search.unindex('group', instance.pk)
@@ -0,0 +1,199 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from yatube import pagecache
+
+from . import conditional, sync, timeline
+from .models import Follow, Tombstone, UserStats
+
+# Граф подписок: счетчики хранятся в UserStats, множества id подписчиков и
+# подписок кешируются и сбрасываются при каждой подписке и отписке.
+
+
+def _followers_key(user_id):
+    return f'social:followers:{user_id}'
+
+
+def _following_key(user_id):
+    return f'social:following:{user_id}'
+
+
+def get_stats(user):
+    stats = UserStats.objects.filter(user=user).first()
+    return stats or UserStats(user=user)
+
+
+def follower_ids(user):
+    key = _followers_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(Follow.objects.filter(
+            author=user, user__isnull=False).values_list('user_id',
+                                                         flat=True))
+        cache.set(key, ids, settings.SOCIAL_GRAPH_TIMEOUT)
+    return ids
+
+
+def following_ids(user):
+    key = _following_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(Follow.objects.filter(
+            user=user).values_list('author_id', flat=True))
+        cache.set(key, ids, settings.SOCIAL_GRAPH_TIMEOUT)
+    return ids
+
+
+# подписан ли user на author
+def is_following(user, author):
+    if not user.is_authenticated:
+        return False
+    return author.pk in following_ids(user)
+
+
+def bump_counters(field, user_ids, delta):
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    if not user_ids:
+        return
+    # строку статистики создаем только при увеличении: при удалении
+    # пользователя каскадом она не должна появиться заново
+    queryset = UserStats.objects.filter(user_id__in=user_ids)
+    if delta > 0:
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+    else:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def invalidate(user_ids=(), author_ids=()):
+    cache.delete_many(
+        [_following_key(user_id) for user_id in user_ids]
+        + [_followers_key(author_id) for author_id in author_ids]
+    )
+
+
+# поддерживает ли база INSERT ... RETURNING: SQLite - с версии 3.35
+def _can_return_rows(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    return (connection.vendor == 'sqlite'
+            and connection.Database.sqlite_version_info >= (3, 35))
+
+
+# части списка, в каждой не больше параметров, чем допускает база
+# (у SQLite по умолчанию 999 на запрос)
+def _chunks(connection, fields, values):
+    size = max(1, connection.ops.bulk_batch_size(fields, values))
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+# вставка подписок, id авторов действительно вставленных строк: строка,
+# которую успел вставить параллельный запрос, не считается. PostgreSQL
+# и SQLite 3.35+ возвращают их INSERT ... ON CONFLICT DO NOTHING
+# RETURNING, на остальных СУБД строки вставляются по одной
+def _insert_follows(user_id, author_ids):
+    connection = connections[router.db_for_write(Follow)]
+    if not _can_return_rows(connection):
+        inserted = []
+        for author_id in author_ids:
+            try:
+                with transaction.atomic(using=connection.alias):
+                    Follow.objects.using(connection.alias).bulk_create(
+                        [Follow(user_id=user_id, author_id=author_id)])
+            except IntegrityError:
+                continue
+            inserted.append(author_id)
+        return inserted
+    quote = connection.ops.quote_name
+    created = connection.ops.adapt_datetimefield_value(timezone.now())
+    fields = ['user_id', 'author_id', 'created']
+    inserted = []
+    with connection.cursor() as cursor:
+        for chunk in _chunks(connection, fields, author_ids):
+            params = []
+            for author_id in chunk:
+                params += [user_id, author_id, created]
+            rows = ', '.join(['(%s, %s, %s)'] * len(chunk))
+            cursor.execute(
+                f'INSERT INTO {quote(Follow._meta.db_table)} '
+                f'({", ".join(quote(field) for field in fields)}) '
+                f'VALUES {rows} ON CONFLICT DO NOTHING '
+                f'RETURNING {quote("author_id")}', params)
+            inserted += [author_id for author_id, in cursor.fetchall()]
+    return inserted
+
+
+# удаление подписок по id без сбора связанных объектов и сигналов:
+# у Follow нет зависимых строк, каскадам удалять нечего
+def _delete_follows(connection, pks):
+    table = connection.ops.quote_name(Follow._meta.db_table)
+    column = connection.ops.quote_name(Follow._meta.pk.column)
+    with connection.cursor() as cursor:
+        for chunk in _chunks(connection, [column], pks):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {column} IN ({placeholders})',
+                chunk)
+
+
+# массовая подписка, например при импорте списка контактов.
+# Строки Follow вставляются одним INSERT, повторная подписка ничего не
+# меняет. Сигналов post_save нет, их работа делается здесь пачкой
+def follow_many(user, authors):
+    authors = {author.pk: author for author in authors
+               if author.pk != user.pk}
+    existing = set(Follow.objects.filter(
+        user=user, author_id__in=authors).values_list('author_id',
+                                                      flat=True))
+    new_ids = [author_id for author_id in authors
+               if author_id not in existing]
+    if not new_ids:
+        return 0
+    with transaction.atomic():
+        new_ids = _insert_follows(user.pk, new_ids)
+        if not new_ids:
+            return 0
+        bump_counters('followers_count', new_ids, 1)
+        bump_counters('following_count', [user.pk], len(new_ids))
+    invalidate([user.pk], new_ids)
+    pagecache.purge(f'author:{user.pk}',
+                    *(f'author:{author_id}' for author_id in new_ids))
+    conditional.bump_follows(user.pk, *new_ids)
+    timeline.backfill(user, *[authors[author_id] for author_id in new_ids])
+    return len(new_ids)
+
+
+# массовая отписка: строки Follow удаляются одним DELETE без сигналов
+# post_delete, их работа (счетчики, кеши, следы для синхронизации,
+# раскладка лент) делается здесь пачкой
+def unfollow_many(user, authors):
+    connection = connections[router.db_for_write(Follow)]
+    with transaction.atomic(using=connection.alias):
+        follows = dict(Follow.objects.select_for_update().filter(
+            user=user, author__in=list(authors)).values_list(
+                'pk', 'author_id'))
+        if not follows:
+            return 0
+        _delete_follows(connection, list(follows))
+        author_ids = list(follows.values())
+        bump_counters('followers_count', author_ids, -1)
+        bump_counters('following_count', [user.pk], -len(author_ids))
+        Tombstone.objects.bulk_create(
+            Tombstone(kind=Tombstone.FOLLOW, object_id=pk,
+                      author_id=author_id, user_id=user.pk)
+            for pk, author_id in follows.items())
+        sync.leave_timeline(user.pk, *author_ids)
+        timeline.prune(user, *author_ids)
+        timeline.restore_fan_out(*author_ids)
+    invalidate([user.pk], author_ids)
+    pagecache.purge(f'author:{user.pk}',
+                    *(f'author:{author_id}' for author_id in author_ids))
+    conditional.bump_follows(user.pk, *author_ids)
+    return len(author_ids)
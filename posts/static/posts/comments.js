@@ -0,0 +1,25 @@
+// "Показать еще" под комментариями: следующая порция подгружается
+// фрагментом и встает на место ссылки. Без JavaScript ссылка ведет
+// на страницу поста с курсором.
+document.addEventListener('click', function (event) {
+    var link = event.target.closest('a.comments-more');
+    if (!link) {
+        return;
+    }
+    event.preventDefault();
+    link.classList.add('disabled');
+    fetch(link.dataset.fragment, {credentials: 'same-origin'})
+        .then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.statusText);
+            }
+            return response.text();
+        })
+        .then(function (html) {
+            link.insertAdjacentHTML('afterend', html);
+            link.remove();
+        })
+        .catch(function () {
+            window.location = link.href;
+        });
+});
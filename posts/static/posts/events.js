@@ -0,0 +1,19 @@
+// Сообщение о новых записях: страница подписывается на поток событий
+// и показывает число новых постов или комментариев со ссылкой на
+// обновление. Без JavaScript или EventSource сообщение остается скрытым.
+document.querySelectorAll('.live-updates').forEach(function (banner) {
+    if (!window.EventSource) {
+        return;
+    }
+    var count = 0;
+    var counter = banner.querySelector('.live-updates-count');
+    var source = new EventSource(banner.dataset.events);
+    source.addEventListener(banner.dataset.event, function () {
+        count += 1;
+        counter.textContent = count;
+        banner.hidden = false;
+    });
+    window.addEventListener('pagehide', function () {
+        source.close();
+    });
+});
@@ -0,0 +1,62 @@
+// Бесконечная прокрутка ленты: когда паджинатор подходит к экрану,
+// следующая порция карточек загружается фрагментом и добавляется
+// в ленту. Адрес следующей порции приходит в заголовке Link
+// (rel="next"). Без JavaScript остается обычная навигация по ссылкам.
+(function () {
+    var link = document.querySelector(
+        '.feed-pagination a[rel="next"][data-fragment]');
+    var feed = document.querySelector('.feed');
+    if (!link || !feed || !window.IntersectionObserver) {
+        return;
+    }
+    var nav = link.closest('.feed-pagination');
+    var loading = false;
+    var observer;
+
+    function nextFragment(header) {
+        var match = /<([^>]*)>;\s*rel="next"/.exec(header || '');
+        return match ? match[1] : null;
+    }
+
+    function load() {
+        if (loading) {
+            return;
+        }
+        loading = true;
+        fetch(link.dataset.fragment, {credentials: 'same-origin'})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+                return response.text().then(function (html) {
+                    feed.insertAdjacentHTML('beforeend', html);
+                    var next = nextFragment(response.headers.get('Link'));
+                    if (!next) {
+                        observer.disconnect();
+                        nav.remove();
+                        return;
+                    }
+                    // ссылка ведет на ту же порцию страницей целиком
+                    link.dataset.fragment = next;
+                    link.search = new URL(next, window.location.href).search;
+                    loading = false;
+                    // паджинатор мог остаться у экрана: проверяем заново
+                    observer.unobserve(nav);
+                    observer.observe(nav);
+                });
+            })
+            .catch(function () {
+                // остается обычная ссылка на следующую страницу
+                observer.disconnect();
+            });
+    }
+
+    observer = new IntersectionObserver(function (entries) {
+        if (entries.some(function (entry) {
+            return entry.isIntersecting;
+        })) {
+            load();
+        }
+    }, {rootMargin: '600px 0px'});
+    observer.observe(nav);
+})();
@@ -0,0 +1,73 @@
+import hashlib
+import os
+from contextlib import contextmanager
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File, locks
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+LOCK_NAME = '.content.lock'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла - хеш его содержимого.
+
+    Файл posts/photo.jpg сохраняется как posts/ab/cd/<sha256>.jpg, поэтому
+    одинаковые загрузки занимают место на диске один раз. Удалять файлы
+    нужно только после проверки, что на них не ссылаются другие посты,
+    под lock() (см. posts.signals).
+    """
+
+    # блокировка между процессами: проверка ссылок с удалением и запись
+    # файла не пересекаются
+    @contextmanager
+    def lock(self):
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, LOCK_NAME), 'a') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest[2:4],
+                            digest + extension).replace('\\', '/')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                f'Имя файла {name} длиннее max_length={max_length}')
+        with self.lock():
+            if self.exists(name):
+                return name
+            return self._save(name, content)
+
+    # после коммита поста: файл, найденный при save() уже существующим,
+    # мог удалить сборщик, не увидевший незакоммиченную ссылку
+    def restore(self, name, content):
+        with self.lock():
+            if self.exists(name):
+                return False
+            self._save(name, content)
+            return True
+
+
+post_image_storage = ContentAddressedStorage()
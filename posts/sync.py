@@ -0,0 +1,177 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import social, timeline
+from .models import Comment, Follow, Group, Post, Tombstone
+from .paginator import decode_cursor, encode_cursor
+
+# Синхронизация: "все, что изменилось после токена". Токен - непрозрачная
+# строка с моментом прошлой синхронизации. Изменения ищутся по индексу
+# updated_at, удаления - по таблице Tombstone. Транзакция, начатая до
+# выдачи токена, может закоммититься позже, поэтому выборка захватывает
+# SYNC_OVERLAP секунд до токена: клиент должен убирать повторы по id.
+# Следы удалений живут SYNC_TOMBSTONE_TTL, более старый токен устарел,
+# и клиенту нужно загрузить ленту заново.
+
+User = get_user_model()
+
+
+class TokenExpired(Exception):
+    pass
+
+
+# overlap: захватывать ли SYNC_OVERLAP секунд до токена. Токен "сейчас"
+# захватывает, токен продолжения (has_more) указывает на уже отданную
+# запись и не захватывает
+def encode_token(moment, overlap=True):
+    return encode_cursor([moment.isoformat(), int(overlap)])
+
+
+def decode_token(token):
+    values, _ = decode_cursor(token)
+    if (not values or len(values) != 2
+            or not isinstance(values[0], str)):
+        raise ValueError('Неверный токен синхронизации')
+    try:
+        moment = parse_datetime(values[0])
+    except ValueError:
+        moment = None
+    # токены выдаются только с часовым поясом и не из будущего
+    now = timezone.now()
+    if moment is None or timezone.is_naive(moment) or moment > now:
+        raise ValueError('Неверный токен синхронизации')
+    if moment < now - settings.SYNC_TOMBSTONE_TTL:
+        raise TokenExpired
+    if values[1]:
+        moment -= timedelta(seconds=settings.SYNC_OVERLAP)
+    return moment
+
+
+class Scope:
+    """Область синхронизации: выборки постов, комментариев и удалений."""
+
+    def __init__(self, posts, tombstones, follows=None):
+        self.posts = posts
+        self.comments = Comment.objects.filter(
+            post__in=posts.values('pk')).select_related('author')
+        self.tombstones = tombstones
+        self.follows = follows
+
+
+# scope: index, group:<slug>, author:<username> или follow
+def get_scope(name, user):
+    kind, _, value = name.partition(':')
+    if kind == 'index':
+        return Scope(Post.objects.all(), Tombstone.objects.filter(
+            kind__in=(Tombstone.POST, Tombstone.COMMENT)))
+    if kind == 'group':
+        group = get_object_or_404(Group, slug=value)
+        return Scope(
+            Post.objects.filter(group=group),
+            Tombstone.objects.filter(
+                kind__in=(Tombstone.POST, Tombstone.MOVED),
+                group_id=group.pk)
+            | Tombstone.objects.filter(
+                kind=Tombstone.COMMENT,
+                post_id__in=group.posts.values('pk')),
+        )
+    if kind == 'author':
+        author = get_object_or_404(User, username=value)
+        return Scope(
+            Post.objects.filter(author=author),
+            Tombstone.objects.filter(kind=Tombstone.POST,
+                                     author_id=author.pk)
+            | Tombstone.objects.filter(
+                kind=Tombstone.COMMENT,
+                post_id__in=author.posts.values('pk')),
+        )
+    if kind == 'follow' and user.is_authenticated:
+        posts = timeline.timeline_posts(user)
+        return Scope(
+            posts,
+            Tombstone.objects.filter(
+                kind=Tombstone.POST,
+                author_id__in=social.following_ids(user))
+            | Tombstone.objects.filter(kind=Tombstone.COMMENT,
+                                       post_id__in=posts.values('pk'))
+            | Tombstone.objects.filter(
+                kind__in=(Tombstone.FOLLOW, Tombstone.MOVED),
+                user_id=user.pk),
+            follows=Follow.objects.filter(user=user).select_related(
+                'author'),
+        )
+    raise ValueError('Неизвестная область синхронизации')
+
+
+def _take(queryset, field, since, limit):
+    items = list(queryset.filter(**{f'{field}__gt': since}).order_by(
+        field, 'pk')[:limit + 1])
+    if len(items) > limit:
+        return items[:limit], getattr(items[limit - 1], field)
+    return items, None
+
+
+# изменения области после since; если какой-то выборки больше limit,
+# токен указывает на момент последней отданной записи и has_more = True.
+# Записи с тем же моментом придут еще раз
+def changes(scope, since, limit):
+    now = timezone.now()
+    posts, posts_cut = _take(scope.posts.select_related('author', 'group'),
+                             'updated_at', since, limit)
+    comments, comments_cut = _take(scope.comments, 'updated_at', since,
+                                   limit)
+    deleted, deleted_cut = _take(scope.tombstones, 'deleted_at', since,
+                                 limit)
+    follows, follows_cut = [], None
+    if scope.follows is not None:
+        follows, follows_cut = _take(scope.follows, 'created', since, limit)
+    cuts = [cut for cut in (posts_cut, comments_cut, deleted_cut,
+                            follows_cut) if cut is not None]
+    return {
+        'posts': posts,
+        'comments': comments,
+        'follows': follows,
+        'deleted': deleted,
+        'token': (encode_token(min(cuts) - timedelta(microseconds=1),
+                               overlap=False) if cuts
+                  else encode_token(now)),
+        'has_more': bool(cuts),
+    }
+
+
+def bury(kind, object_id, **scope):
+    Tombstone.objects.create(kind=kind, object_id=object_id, **scope)
+
+
+# пост сменил группу: для старой группы он все равно что удален, а след
+# ухода из новой группы, если пост в нее вернулся, больше не нужен
+def move_post(post, old_group_id):
+    if old_group_id is not None:
+        bury(Tombstone.MOVED, post.pk, author_id=post.author_id,
+             group_id=old_group_id)
+    if post.group_id is not None:
+        Tombstone.objects.filter(kind=Tombstone.MOVED, object_id=post.pk,
+                                 group_id=post.group_id).delete()
+
+
+# после отписки посты авторов уходят из ленты подписчика
+def leave_timeline(user_id, *author_ids):
+    posts = Post.objects.filter(author_id__in=author_ids).values_list(
+        'pk', 'author_id').order_by()
+    Tombstone.objects.bulk_create(
+        (Tombstone(kind=Tombstone.MOVED, object_id=post_id,
+                   author_id=author_id, user_id=user_id)
+         for post_id, author_id in posts.iterator()),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+    )
+
+
+def prune(before=None):
+    if before is None:
+        before = timezone.now() - settings.SYNC_TOMBSTONE_TTL
+    return Tombstone.objects.filter(deleted_at__lt=before).delete()[0]
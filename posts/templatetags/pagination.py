@@ -0,0 +1,70 @@
+from django import template
+from django.conf import settings
+
+register = template.Library()
+
+
+# текущий query string с новым курсором: остальные параметры (например,
+# поисковый запрос) сохраняются
+@register.simple_tag(takes_context=True)
+def cursor_query(context, cursor):
+    query = context['request'].GET.copy()
+    query.pop('page', None)
+    query['cursor'] = cursor
+    return query.urlencode()
+
+
+# query string с номером страницы вместо курсора
+@register.simple_tag(takes_context=True)
+def page_query(context, number):
+    query = context['request'].GET.copy()
+    query.pop('cursor', None)
+    query['page'] = number
+    return query.urlencode()
+
+
+# номера страниц вокруг текущей; None - пропуск ("…"). Если число записей
+# приблизительное (paginator.count_is_approximate), последняя страница
+# не показывается: ее номер может быть неверным
+def page_window_numbers(number, num_pages, window, approximate=False):
+    start = max(2, number - window)
+    end = max(number, min(num_pages, number + window))
+    if not approximate:
+        end = min(end, num_pages - 1)
+    # пропуск из одной страницы заменяем ее номером
+    if start == 3:
+        start = 2
+    if not approximate and end == num_pages - 2:
+        end = num_pages - 1
+    numbers = [1]
+    if start > 2:
+        numbers.append(None)
+    numbers.extend(range(start, end + 1))
+    if approximate:
+        if end < num_pages:
+            numbers.append(None)
+    elif num_pages > 1:
+        if end < num_pages - 1:
+            numbers.append(None)
+        numbers.append(num_pages)
+    return numbers
+
+
+# навигация по номерам страниц: первая, последняя и PAGINATOR_WINDOW
+# страниц с каждой стороны от текущей
+@register.inclusion_tag('paginator_window.html', takes_context=True)
+def page_window(context, page, window=None):
+    if window is None:
+        window = settings.PAGINATOR_WINDOW
+    paginator = page.paginator
+    approximate = getattr(paginator, 'count_is_approximate', False)
+    num_pages = paginator.num_pages
+    if approximate and page.has_next():
+        # оценка могла оказаться меньше: следующая страница все же есть
+        num_pages = max(num_pages, page.number + 1)
+    return {
+        'request': context['request'],
+        'page': page,
+        'numbers': page_window_numbers(page.number, num_pages,
+                                       window, approximate),
+    }
@@ -0,0 +1,53 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts import thumbnails
+from posts.fragments import render_feed, render_post_items
+from posts.models import Post
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_items(context, posts):
+    if isinstance(posts, Post):
+        posts = [posts]
+    return mark_safe(render_post_items(list(posts), context.get('user')))
+
+
+# {% feed_cache 'index' page %}...{% endfeed_cache %} - кеш ленты по
+# странице, см. posts.fragments.render_feed
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, name, page):
+        self.nodelist = nodelist
+        self.name = name
+        self.page = page
+
+    def render(self, context):
+        return render_feed(self.name.resolve(context),
+                           context['request'],
+                           self.page.resolve(context),
+                           context.get('user'),
+                           lambda: self.nodelist.render(context))
+
+
+@register.tag
+def feed_cache(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} принимает имя ленты и страницу')
+    nodelist = parser.parse(('endfeed_cache',))
+    parser.delete_first_token()
+    return FeedCacheNode(nodelist, parser.compile_filter(bits[1]),
+                         parser.compile_filter(bits[2]))
+
+
+# <picture> с вариантами картинки поста; если их еще нет, ставим нарезку
+# в очередь и показываем заглушку
+@register.inclusion_tag('posts/post_picture.html')
+def post_picture(post):
+    picture = thumbnails.picture(post)
+    if picture is None:
+        thumbnails.schedule(post)
+    return {'picture': picture}
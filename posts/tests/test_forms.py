@@ -1,9 +1,18 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.models import Group, Post
 
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 
 class NewPost_FormTest(TestCase):
     @classmethod
@@ -65,3 +74,91 @@ class PostEdit_FormTest(TestCase):
             follow=True)
 
         self.assertEqual(response.context['post'].text, self.form_data['text'])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class PostImage_FormTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='TestUser')
+        cls.authorized_user = Client()
+        cls.authorized_user.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @staticmethod
+    def make_image(size, exif=None):
+        buffer = BytesIO()
+        image = Image.new('RGB', size, 'red')
+        if exif is not None:
+            image.save(buffer, 'JPEG', exif=exif)
+        else:
+            image.save(buffer, 'JPEG')
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(),
+                                  content_type='image/jpeg')
+
+    def post_image(self, upload):
+        return self.authorized_user.post(
+            reverse('new_post'),
+            data={'text': 'Пост с картинкой', 'image': upload})
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_oversized_upload_rejected(self):
+        """Слишком большой файл отклоняется формой"""
+        response = self.post_image(self.make_image((64, 64)))
+        self.assertFalse(Post.objects.exists(),
+                         'Пост с большим файлом был создан')
+        self.assertIn('image', response.context['form'].errors)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Картинка с огромным разрешением отклоняется по заголовку"""
+        response = self.post_image(self.make_image((20, 20)))
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('image', response.context['form'].errors)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=32)
+    def test_large_image_downsampled(self):
+        """Большая картинка уменьшается до POST_IMAGE_MAX_SIDE"""
+        self.post_image(self.make_image((128, 64)))
+        with Image.open(Post.objects.get().image) as image:
+            self.assertEqual(image.size, (32, 16))
+
+    def test_exif_stripped(self):
+        """Из сохраненной картинки удаляются данные EXIF"""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        self.post_image(self.make_image((16, 16), exif=exif.tobytes()))
+        with Image.open(Post.objects.get().image) as image:
+            self.assertFalse(image.info.get('exif'),
+                             'EXIF не удален из картинки')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=8)
+    def test_read_only_format_saved_as_jpeg(self):
+        """Картинка в формате, который Pillow не умеет сохранять,
+        пересохраняется в JPEG"""
+        rows = ',\n'.join(['"' + 'a' * 16 + '"'] * 16)
+        xpm = ('/* XPM */\nstatic char *image[] = {\n"16 16 1 1",\n'
+               f'"a c #FF0000",\n{rows}\n}};\n').encode()
+        self.post_image(SimpleUploadedFile('photo.xpm', xpm,
+                                           content_type='image/x-xpm'))
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (8, 8)))
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_oversized_upload_rejected_on_edit(self):
+        """Слишком большой файл отклоняется и формой редактирования"""
+        post = Post.objects.create(text='Без картинки', author=self.user)
+        response = self.authorized_user.post(
+            reverse('post_edit', args=[self.user.username, post.pk]),
+            data={'text': 'Новый текст',
+                  'image': self.make_image((64, 64))})
+        self.assertIn('image', response.context['form'].errors)
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Без картинки')
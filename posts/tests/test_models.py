@@ -1,7 +1,14 @@
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
 
-from posts.models import Group, Post
+from posts.counts import CountedPaginator
+from posts.models import Comment, Group, Post, UserStats
 
 
 class PostModelTest(TestCase):
@@ -66,3 +73,147 @@ class PostModelTest(TestCase):
             метод __str__ должен возвращать название группы"""
         self.assertEqual(self.group.title, self.group.__str__(),
                          'Метод __str__ не возвращает название группы')
+
+
+class CommentsCountTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='TestUser')
+        self.post = Post.objects.create(text='Тестовое сообщение',
+                                        author=self.user)
+
+    def add_comments(self, count):
+        for i in range(count):
+            Comment.objects.create(post=self.post, author=self.user,
+                                   text=f'Комментарий {i}')
+
+    def test_comment_create_increments_counter(self):
+        """Новый комментарий увеличивает comments_count"""
+        self.add_comments(3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3,
+                         'comments_count не учитывает новые комментарии')
+
+    def test_bulk_delete_decrements_counter(self):
+        """Массовое удаление комментариев уменьшает comments_count"""
+        self.add_comments(3)
+        Comment.objects.filter(
+            pk__in=list(self.post.comments.values_list('pk', flat=True)[:2])
+        ).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1,
+                         'comments_count не учитывает удаление')
+
+    def test_full_save_keeps_counter(self):
+        """Сохранение загруженного раньше поста не затирает счетчик"""
+        stale = Post.objects.get(pk=self.post.pk)
+        self.add_comments(2)
+        stale.text = 'Новый текст'
+        stale.save()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.text, self.post.comments_count),
+                         ('Новый текст', 2),
+                         'Сохранение поста затерло comments_count')
+
+    def test_recount_comments_command(self):
+        """Команда recount_comments восстанавливает счетчик"""
+        self.add_comments(2)
+        Post.objects.update(comments_count=42)
+        call_command('recount_comments', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2,
+                         'recount_comments неверно пересчитал счетчик')
+
+    def test_recount_comments_resets_cached_cards(self):
+        """После recount_comments лента показывает новый счетчик"""
+        self.add_comments(2)
+        Post.objects.update(comments_count=42)
+        cache.clear()
+        client = Client()
+        self.assertContains(client.get(reverse('index')), '(42)')
+        call_command('recount_comments', stdout=StringIO())
+        response = client.get(reverse('index'))
+        self.assertNotContains(response, '(42)')
+        self.assertContains(response, '(2)')
+
+
+class PostsCountTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create(username='TestUser')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.other_group = Group.objects.create(title='Другая группа',
+                                                slug='other-group')
+
+    def assertCounts(self, user_count, group_count, other_group_count):
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count,
+                         user_count, 'Неверный счетчик записей автора')
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(
+            (self.group.posts_count, self.other_group.posts_count),
+            (group_count, other_group_count),
+            'Неверный счетчик записей группы')
+
+    def test_counters_follow_posts(self):
+        """Счетчики записей меняются при создании, переносе и удалении"""
+        post = Post.objects.create(text='Тест', author=self.user,
+                                   group=self.group)
+        Post.objects.create(text='Тест', author=self.user)
+        self.assertCounts(2, 1, 0)
+        post.group = self.other_group
+        post.save()
+        self.assertCounts(2, 0, 1)
+        post.delete()
+        self.assertCounts(1, 0, 0)
+
+    def test_full_save_keeps_counter(self):
+        """Сохранение загруженной раньше группы не затирает счетчик"""
+        stale = Group.objects.get(pk=self.group.pk)
+        Post.objects.create(text='Тест', author=self.user, group=self.group)
+        stale.title = 'Новая группа'
+        stale.save()
+        self.assertCounts(1, 1, 0)
+        self.assertEqual(self.group.title, 'Новая группа')
+
+    def test_known_count_skips_count_query(self):
+        """Паджинатор со счетчиком не выполняет COUNT(*)"""
+        paginator = CountedPaginator(Post.objects.all(), 10, count=25)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.num_pages, 3)
+        self.assertFalse(paginator.count_is_approximate)
+
+    def test_planner_estimate_above_threshold(self):
+        """Выше порога используется оценка планировщика"""
+        paginator = CountedPaginator(Post.objects.all(), 10)
+        with self.settings(EXACT_COUNT_THRESHOLD=1000), mock.patch(
+                'posts.counts.planner_estimate', return_value=5000):
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.count, 5000)
+        self.assertTrue(paginator.count_is_approximate)
+
+    def test_approximate_count_pages_past_estimate(self):
+        """При заниженной оценке страницы за num_pages открываются,
+        а наличие следующей решает выборка"""
+        Post.objects.bulk_create(
+            Post(text='Тест', author=self.user) for _ in range(25))
+        paginator = CountedPaginator(Post.objects.order_by('pk'), 10)
+        with mock.patch('posts.counts.approximate_count',
+                        return_value=(5, True)):
+            self.assertEqual(paginator.num_pages, 1)
+            page = paginator.get_page(2)
+            self.assertEqual(page.number, 2)
+            self.assertTrue(page.has_next())
+            page = paginator.get_page(3)
+            self.assertEqual(len(page), 5)
+            self.assertFalse(page.has_next())
+            self.assertEqual(page.end_index(), 25)
+            self.assertEqual(paginator.get_page(9).number, 1)
+
+    def test_cached_count_invalidated(self):
+        """Закешированное число записей сбрасывается новым постом"""
+        Post.objects.create(text='Тест', author=self.user)
+        self.assertEqual(CountedPaginator(Post.objects.all(), 10).count, 1)
+        Post.objects.create(text='Тест', author=self.user)
+        self.assertEqual(CountedPaginator(Post.objects.all(), 10).count, 2)
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from posts.models import Post
+from posts.storage import post_image_storage
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
+OTHER_GIF = SMALL_GIF[:-3] + b'\x0B\x00\x3B'
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTest(TransactionTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='TestUser')
+
+    def create_post(self, content, name='small.gif'):
+        return Post.objects.create(
+            text='Тест', author=self.user,
+            image=SimpleUploadedFile(name, content,
+                                     content_type='image/gif'))
+
+    def test_identical_uploads_share_one_file(self):
+        """Одинаковые картинки хранятся в одном файле"""
+        first = self.create_post(SMALL_GIF, 'first.gif')
+        second = self.create_post(SMALL_GIF, 'second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        directory = os.path.dirname(post_image_storage.path(
+            first.image.name))
+        self.assertEqual(len(os.listdir(directory)), 1,
+                         'Одинаковая картинка сохранена дважды')
+
+    def test_file_name_is_sharded_hash(self):
+        """Имя файла - хеш содержимого в подкаталогах"""
+        post = self.create_post(SMALL_GIF)
+        _, first, second, file_name = post.image.name.split('/')
+        self.assertTrue(file_name.startswith(first + second))
+        self.assertTrue(file_name.endswith('.gif'))
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляется вместе с последним ссылающимся постом"""
+        first = self.create_post(SMALL_GIF)
+        second = self.create_post(SMALL_GIF)
+        name = first.image.name
+
+        first.delete()
+        self.assertTrue(post_image_storage.exists(name),
+                        'Удален файл, на который ссылается другой пост')
+        second.delete()
+        self.assertFalse(post_image_storage.exists(name),
+                         'Файл без ссылок не удален')
+
+    def test_replaced_image_collected(self):
+        """Замененная при редактировании картинка удаляется"""
+        post = self.create_post(SMALL_GIF)
+        old_name = post.image.name
+        post.image = SimpleUploadedFile('other.gif', OTHER_GIF,
+                                        content_type='image/gif')
+        post.save()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(post_image_storage.exists(old_name),
+                         'Старая картинка не удалена после замены')
+
+    def test_file_collected_before_commit_restored(self):
+        """Файл, удаленный сборщиком до коммита нового поста с той же
+        картинкой, записывается заново"""
+        first = self.create_post(SMALL_GIF)
+        name = first.image.name
+        with transaction.atomic():
+            second = self.create_post(SMALL_GIF)
+            # сборщик другого воркера не видит незакоммиченную ссылку
+            post_image_storage.delete(name)
+        self.assertEqual(second.image.name, name)
+        self.assertTrue(post_image_storage.exists(name),
+                        'Картинка нового поста потеряна')
+
+    def test_save_honours_max_length(self):
+        """Имя длиннее max_length не сохраняется"""
+        with self.assertRaises(SuspiciousFileOperation):
+            post_image_storage.save('posts/small.gif',
+                                    ContentFile(SMALL_GIF), max_length=20)
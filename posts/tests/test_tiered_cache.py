@@ -0,0 +1,120 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from yatube.cache import LOCK_SUFFIX
+
+
+# класс тестирования двухуровневого кеша
+class TieredCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_local_tier_serves_hits(self):
+        """Повторное чтение не обращается к общему кешу"""
+        cache.set('key', 'value')
+        with mock.patch.object(cache.shared, 'get') as shared_get:
+            self.assertEqual(cache.get('key'), 'value')
+        shared_get.assert_not_called()
+
+    def test_shared_tier_survives_local_eviction(self):
+        """Значение читается из общего кеша, если локальной копии нет"""
+        cache.set('key', 'value')
+        cache._local.clear()
+        self.assertEqual(cache.get('key'), 'value')
+
+    def test_invalidate_tags(self):
+        """Сброс тега удаляет все помеченные им записи"""
+        cache.set('first', 1, tags=['post:1'])
+        cache.set('second', 2, tags=['post:1', 'group:1'])
+        cache.set('third', 3, tags=['post:2'])
+        cache.invalidate_tags('group:1')
+        self.assertEqual(cache.get_many(['first', 'second', 'third']),
+                         {'first': 1, 'third': 3})
+        cache._local.clear()
+        cache.invalidate_tags('post:1')
+        self.assertIsNone(cache.get('first'),
+                          'Сброс тега не дошел до общего кеша')
+
+    def test_get_or_set_serves_stale_while_locked(self):
+        """Пока значение пересчитывает другой воркер, отдается старое"""
+        cache.set('key', 'old', 60)
+        lock_key = cache.make_key('key') + LOCK_SUFFIX
+        self.assertTrue(cache._acquire(lock_key))
+        try:
+            with mock.patch.object(cache, '_should_refresh',
+                                   return_value=True):
+                value = cache.get_or_set('key', lambda: 'new', 60)
+        finally:
+            cache._release(lock_key)
+        self.assertEqual(value, 'old')
+
+    def test_get_or_set_computes_once(self):
+        """Значение вычисляется один раз и снимает блокировку"""
+        compute = mock.Mock(return_value='value')
+        cache.get_or_set('key', compute, 60)
+        cache.get_or_set('key', compute, 60)
+        compute.assert_called_once_with()
+        lock_key = cache.make_key('key') + LOCK_SUFFIX
+        self.assertTrue(cache._acquire(lock_key),
+                        'get_or_set не снял блокировку')
+        cache._release(lock_key)
+
+    def test_invalidation_during_render_not_lost(self):
+        """Сброс тега между снятием версий и записью не теряется"""
+        versions = cache.tag_versions('post:1')
+        cache.invalidate_tags('post:1')
+        cache.set('key', 'stale', tags=versions)
+        self.assertIsNone(cache.get('key'))
+
+    def test_tag_versions_since(self):
+        """Запись, теги которой сброшены после начала чтения,
+        не сохраняется"""
+        cache.tag_versions('post:1')
+        started = time.time_ns()
+        cache.invalidate_tags('post:1')
+        versions = cache.tag_versions('post:1', 'post:2', since=started)
+        cache.set('key', 'stale', tags=versions)
+        self.assertIsNone(cache.shared.get(cache.make_key('key')))
+        cache.set('key', 'fresh', tags=cache.tag_versions(
+            'post:1', 'post:2', since=time.time_ns()))
+        self.assertEqual(cache.get('key'), 'fresh')
+
+    def test_get_or_set_invalidated_while_computing(self):
+        """Сброс тега во время вычисления делает значение устаревшим"""
+        def compute():
+            cache.invalidate_tags('post:1')
+            return 'stale'
+
+        cache.get_or_set('key', compute, 60, tags=['post:1'])
+        self.assertEqual(cache.get_or_set('key', 'fresh', 60,
+                                          tags=['post:1']), 'fresh')
+
+    def test_lock_is_exclusive(self):
+        """Блокировку получает только один; брошенная блокировка
+        истекает"""
+        lock_key = cache.make_key('key') + LOCK_SUFFIX
+        self.assertTrue(cache._acquire(lock_key))
+        self.assertFalse(cache._acquire(lock_key))
+        self.assertFalse(cache.add('key', 'value'),
+                         'add() записал значение под чужой блокировкой')
+        with mock.patch.object(cache, '_lock_timeout', -1):
+            self.assertTrue(cache._acquire(lock_key))
+        cache._release(lock_key)
+        self.assertTrue(cache.add('key', 'value'))
+        self.assertFalse(cache.add('key', 'other'))
+
+    def test_set_many_key_tags(self):
+        """set_many помечает каждый ключ своими тегами и не пишет
+        устаревшие по снимку"""
+        first = cache.tag_versions('post:1')
+        second = cache.tag_versions('post:2')
+        cache.invalidate_tags('post:2')
+        cache.set_many({'first': 1, 'second': 2},
+                       key_tags={'first': first, 'second': second})
+        self.assertEqual(cache.get_many(['first', 'second']), {'first': 1})
+        cache.invalidate_tags('post:1')
+        self.assertIsNone(cache.get('first'))
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+
+# класс тестирования постраничного вывода комментариев
+@override_settings(COMMENTS_IN_PAGE=3, COMMENTS_BATCH=4)
+class CommentsPaginationTest(TestCase):
+    AUTH_USER_NAME = 'TestUser'
+    COMMENTS = 10
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(
+            username=cls.AUTH_USER_NAME)
+        cls.post = Post.objects.create(text='Тестовая запись',
+                                       author=cls.user)
+        for i in range(cls.COMMENTS):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'Комментарий {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.post_url = reverse('post', args=[self.AUTH_USER_NAME,
+                                              self.post.pk])
+        self.fragment_url = reverse('comments_fragment',
+                                    args=[self.AUTH_USER_NAME, self.post.pk])
+
+    def test_first_page_capped(self):
+        """На странице поста только первые COMMENTS_IN_PAGE комментариев"""
+        response = self.guest_client.get(self.post_url)
+        comments = response.context['comments']
+        self.assertEqual([comment.text for comment in comments],
+                         ['Комментарий 9', 'Комментарий 8', 'Комментарий 7'])
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'comments-more')
+
+    def test_fragment_returns_next_batch(self):
+        """Фрагмент отдает следующую порцию без шаблона страницы"""
+        cursor = self.guest_client.get(
+            self.post_url).context['comments'].next_cursor
+        response = self.guest_client.get(self.fragment_url,
+                                         {'cursor': cursor})
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual([comment.text for comment in
+                          response.context['comments']],
+                         [f'Комментарий {i}' for i in range(6, 2, -1)])
+
+    def test_last_batch_has_no_more_link(self):
+        """Последняя порция не содержит ссылки на следующую"""
+        response = self.guest_client.get(self.fragment_url)
+        for _ in range(2):
+            cursor = response.context['comments'].next_cursor
+            response = self.guest_client.get(self.fragment_url,
+                                             {'cursor': cursor})
+        self.assertEqual(len(response.context['comments']), 2)
+        self.assertNotContains(response, 'comments-more')
+
+    def test_invalid_comment_renders_post_page(self):
+        """Пустой комментарий возвращает страницу поста с ошибкой формы"""
+        response = self.authorized_client.post(
+            reverse('add_comment', args=[self.AUTH_USER_NAME,
+                                         self.post.pk]),
+            {'text': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'posts/post.html')
+        self.assertTrue(response.context['form'].errors)
+        self.assertEqual(Comment.objects.count(), self.COMMENTS)
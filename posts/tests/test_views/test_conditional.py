@@ -0,0 +1,129 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post
+
+
+# класс тестирования условных GET-запросов
+class ConditionalGetViewTest(TestCase):
+    AUTH_USER_NAME = 'TestUser'
+    GROUP_SLUG = 'test-group'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(
+            username=cls.AUTH_USER_NAME)
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug=cls.GROUP_SLUG)
+        cls.post = Post.objects.create(text='Тестовая запись',
+                                       author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = [
+            reverse('index'),
+            reverse('group', args=[self.GROUP_SLUG]),
+            reverse('profile', args=[self.AUTH_USER_NAME]),
+            reverse('post', args=[self.AUTH_USER_NAME, self.post.pk]),
+        ]
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 без тела"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_comment_changes_etag(self):
+        """Новый комментарий меняет ETag страницы поста"""
+        url = self.urls[-1]
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Комментарий')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_edit_changes_etag(self):
+        """Редактирование поста меняет ETag ленты"""
+        etag = self.guest_client.get(self.urls[0])['ETag']
+        self.post.text = 'Исправленная запись'
+        self.post.save()
+        response = self.guest_client.get(self.urls[0],
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """Гость и автор получают разные ETag"""
+        authorized_client = Client()
+        authorized_client.force_login(self.user)
+        self.assertNotEqual(self.guest_client.get(self.urls[0])['ETag'],
+                            authorized_client.get(self.urls[0])['ETag'])
+
+    def backdate(self):
+        """Сдвигает даты изменений на час назад: Last-Modified
+        с точностью до секунды должен отличать последующие изменения"""
+        hour_ago = timezone.now() - timedelta(hours=1)
+        Post.objects.update(updated_at=hour_ago)
+        Comment.objects.update(updated_at=hour_ago)
+        Follow.objects.update(created=hour_ago)
+
+    def assertModified(self, url, last_modified):
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200,
+                         f'{url} ответил 304 на устаревший If-Modified-Since')
+
+    def test_delete_moves_last_modified(self):
+        """Удаление поста двигает Last-Modified ленты, группы и профиля"""
+        post = Post.objects.create(text='Удаляемая запись', author=self.user,
+                                   group=self.group)
+        self.backdate()
+        dates = {url: self.guest_client.get(url)['Last-Modified']
+                 for url in self.urls[:3]}
+        post.delete()
+        for url, last_modified in dates.items():
+            with self.subTest(url=url):
+                self.assertModified(url, last_modified)
+
+    def test_comment_delete_moves_last_modified(self):
+        """Удаление комментария двигает Last-Modified страницы поста"""
+        comment = Comment.objects.create(post=self.post, author=self.user,
+                                         text='Комментарий')
+        self.backdate()
+        url = self.urls[-1]
+        last_modified = self.guest_client.get(url)['Last-Modified']
+        comment.delete()
+        self.assertModified(url, last_modified)
+
+    def test_follow_moves_profile_last_modified(self):
+        """Подписка меняет счетчики и Last-Modified профиля"""
+        self.backdate()
+        url = self.urls[2]
+        last_modified = self.guest_client.get(url)['Last-Modified']
+        follower = get_user_model().objects.create(username='Follower')
+        Follow.objects.create(user=follower, author=self.user)
+        self.assertModified(url, last_modified)
+
+    def test_version_scoped_to_page(self):
+        """Комментарий в чужой группе не меняет ETag страницы группы"""
+        other_group = Group.objects.create(title='Другая', slug='other')
+        other_post = Post.objects.create(text='Чужая запись',
+                                         author=self.user, group=other_group)
+        url = self.urls[1]
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(post=other_post, author=self.user,
+                               text='Комментарий')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+
+from django.contrib.auth import get_user_model
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts import events
+from posts.models import Comment, Group, Post
+
+
+# класс тестирования брокера событий
+class BrokerTest(TestCase):
+    def test_delivers_to_subscribed_channels(self):
+        """Событие получают только подписчики его каналов"""
+        broker = events.Broker(10)
+        received, other = [], []
+        broker.subscribe(['group:cats'], received.append)
+        broker.subscribe(['post:1'], other.append)
+        event = broker.publish(['posts', 'group:cats'], 'post', {'id': 1})
+        self.assertEqual(received, [event])
+        self.assertEqual(other, [])
+
+    def test_unsubscribe(self):
+        """После отписки события не приходят"""
+        broker = events.Broker(10)
+        received = []
+        token, _ = broker.subscribe(['posts'], received.append)
+        broker.unsubscribe(token)
+        broker.publish(['posts'], 'post', {'id': 1})
+        self.assertEqual(received, [])
+        self.assertEqual(broker.subscribers_count(), 0)
+
+    def test_backlog_replay(self):
+        """Переподключившийся клиент получает пропущенные события"""
+        broker = events.Broker(10)
+        first = broker.publish(['posts'], 'post', {'id': 1})
+        second = broker.publish(['posts'], 'post', {'id': 2})
+        broker.publish(['post:5'], 'comment', {'id': 3})
+        _, missed = broker.subscribe(['posts'], lambda event: None,
+                                     last_id=first.id)
+        self.assertEqual(missed, [second])
+
+    def test_parse_channels(self):
+        """Неизвестные каналы отбрасываются, по умолчанию - posts"""
+        self.assertEqual(events.parse_channels(['group:cats', 'x', 'post:a']),
+                         ['group:cats'])
+        self.assertEqual(events.parse_channels([]), ['posts'])
+
+
+# класс тестирования публикации событий сигналами; on_commit
+# срабатывает только вне транзакции TestCase
+class EventSignalsTest(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='TestUser')
+        self.group = Group.objects.create(title='Котики', slug='cats')
+        self.received = []
+        self.tokens = []
+
+    def tearDown(self):
+        for token in self.tokens:
+            events.broker.unsubscribe(token)
+
+    def subscribe(self, *channels):
+        token, _ = events.broker.subscribe(channels, self.received.append)
+        self.tokens.append(token)
+
+    def test_new_post_and_comment(self):
+        """Новый пост и комментарий публикуются в свои каналы"""
+        self.subscribe('posts', 'group:cats')
+        post = Post.objects.create(text='Текст', author=self.user,
+                                   group=self.group)
+        self.subscribe(f'post:{post.pk}')
+        post.save()
+        comment = Comment.objects.create(post=post, author=self.user,
+                                         text='Комментарий')
+        self.assertEqual([event.name for event in self.received],
+                         ['post', 'comment'])
+        post_event, comment_event = self.received
+        self.assertEqual(post_event.channels,
+                         {'posts', 'group:cats'})
+        self.assertEqual(post_event.data['group'], 'cats')
+        self.assertEqual(post_event.data['url'],
+                         reverse('post', args=['TestUser', post.pk]))
+        self.assertEqual(comment_event.channels, {f'post:{post.pk}'})
+        self.assertEqual(comment_event.data['id'], comment.pk)
+
+
+# класс тестирования потоков событий
+class EventStreamTest(TestCase):
+    def test_wsgi_view_stops_reconnects(self):
+        """Под WSGI поток не держит воркер: вью отвечает 204"""
+        response = Client().get(reverse('events'),
+                                {'channel': 'group:dogs'})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(events.broker.subscribers_count(), 0)
+
+    def test_asgi_stream(self):
+        """ASGI-поток отдает событие из другого потока и закрывается
+        при отключении клиента"""
+        from yatube.asgi import application
+
+        sent = []
+        received = threading.Event()
+
+        async def run():
+            disconnected = asyncio.Event()
+
+            async def receive():
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                if len(sent) == 2:
+                    threading.Thread(target=events.broker.publish, args=(
+                        ['post:42'], 'comment', {'id': 7})).start()
+                elif b'event: comment' in message.get('body', b''):
+                    received.set()
+                    disconnected.set()
+
+            await asyncio.wait_for(application({
+                'type': 'http',
+                'method': 'GET',
+                'path': reverse('events'),
+                'query_string': b'channel=post:42',
+                'headers': [],
+            }, receive, send), timeout=5)
+
+        asyncio.run(run())
+        self.assertTrue(received.is_set())
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream; charset=utf-8'),
+                      sent[0]['headers'])
+        self.assertEqual(events.broker.subscribers_count(), 0)
+
+    @override_settings(EVENTS_ENABLED=True)
+    def test_pages_subscribe(self):
+        """Страницы подписываются на каналы своих событий"""
+        user = get_user_model().objects.create(username='Reader')
+        group = Group.objects.create(title='Собаки', slug='dogs')
+        post = Post.objects.create(text='Текст', author=user, group=group)
+        client = Client()
+        for url, channel in (
+                (reverse('index'), 'posts'),
+                (reverse('group', args=['dogs']), 'group:dogs'),
+                (reverse('post', args=['Reader', post.pk]),
+                 f'post:{post.pk}')):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertContains(
+                    response, f'{reverse("events")}?channel={channel}')
+
+    def test_pages_not_subscribed_without_asgi(self):
+        """Без yatube.asgi страницы не подписываются на поток"""
+        response = Client().get(reverse('index'))
+        self.assertNotContains(response, reverse('events'))
+        self.assertNotContains(response, 'posts/events.js')
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+
+# класс тестирования кеша страниц ленты
+@override_settings(POSTS_IN_PAGE=2)
+class FeedCacheViewTest(TestCase):
+    AUTH_USER_NAME = 'TestUser'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(
+            username=cls.AUTH_USER_NAME)
+        cls.posts = [Post.objects.create(text=f'Запись {i}', author=cls.user)
+                     for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.edit_url = reverse('post_edit', args=[self.AUTH_USER_NAME,
+                                                   self.posts[-1].pk])
+
+    def test_pages_cached_separately(self):
+        """Разные страницы ленты кешируются под разными ключами"""
+        first = self.guest_client.get(reverse('index'))
+        second = self.guest_client.get(reverse('index') + '?page=2')
+        self.assertContains(first, 'Запись 2')
+        self.assertNotContains(second, 'Запись 2')
+        self.assertContains(second, 'Запись 0')
+
+    def test_new_post_visible_immediately(self):
+        """Новый пост сразу появляется в ленте"""
+        self.guest_client.get(reverse('index'))
+        Post.objects.create(text='Свежая запись', author=self.user)
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Свежая запись')
+
+    def test_owner_overlay(self):
+        """Автор и гость получают разные варианты ленты"""
+        owner_response = self.authorized_client.get(reverse('index'))
+        guest_response = self.guest_client.get(reverse('index'))
+        self.assertContains(owner_response, self.edit_url)
+        self.assertNotContains(guest_response, self.edit_url)
+
+    def test_edit_invalidates_feed(self):
+        """Изменение поста сбрасывает кеш ленты"""
+        self.guest_client.get(reverse('index'))
+        post = self.posts[-1]
+        post.text = 'Исправленная запись'
+        post.save()
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Исправленная запись')
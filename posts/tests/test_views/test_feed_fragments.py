@@ -0,0 +1,123 @@
+import json
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from posts import social
+from posts.models import Group, Post
+
+NEXT_RE = re.compile(r'<([^>]*)>; rel="next"')
+
+
+# класс тестирования фрагментов ленты для бесконечной прокрутки
+@override_settings(POSTS_IN_PAGE=3)
+class FeedFragmentsTest(TestCase):
+    POSTS_COUNT = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username='Author')
+        cls.reader = get_user_model().objects.create(username='Reader')
+        cls.group = Group.objects.create(title='Котики', slug='cats')
+        Post.objects.bulk_create([
+            Post(text=f'Запись {i}', author=cls.author, group=cls.group)
+            for i in range(cls.POSTS_COUNT)])
+        Post.objects.create(text='Чужая запись', author=cls.reader)
+        social.follow_many(cls.reader, [cls.author])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def collect(self, client, url):
+        """Листает фрагменты по ссылкам rel=next, возвращает тексты
+        записей и ответы"""
+        texts, responses = [], []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            responses.append(response)
+            texts += re.findall(r'Запись \d|Чужая запись',
+                                response.content.decode())
+            match = NEXT_RE.search(response.get('Link', ''))
+            url = match.group(1) if match else None
+        return texts, responses
+
+    def test_fragment_has_only_cards(self):
+        """Фрагмент - только карточки, без base.html и паджинатора"""
+        response = self.guest_client.get(reverse('index_fragment'))
+        content = response.content.decode()
+        self.assertEqual(content.count('class="card mb-3'), 3)
+        self.assertNotIn('<html', content)
+        self.assertNotIn('pagination', content)
+
+    def test_feeds(self):
+        """Фрагменты листают ленты до конца без повторов"""
+        cases = (
+            (self.guest_client, reverse('index_fragment'), 6),
+            (self.guest_client, reverse('group_fragment', args=['cats']), 5),
+            (self.guest_client,
+             reverse('profile_fragment', args=['Reader']), 1),
+            (self.authorized_client, reverse('follow_fragment'), 5),
+        )
+        for client, url, expected in cases:
+            with self.subTest(url=url):
+                texts, responses = self.collect(client, url)
+                self.assertEqual(len(texts), expected)
+                self.assertEqual(len(set(texts)), expected)
+                self.assertNotIn('Link', responses[-1])
+
+    def test_page_points_to_fragment(self):
+        """Ссылка на следующую страницу знает адрес следующего
+        фрагмента, он же приходит в Link первого фрагмента"""
+        response = self.guest_client.get(reverse('group', args=['cats']))
+        fragment = self.guest_client.get(reverse('group_fragment',
+                                                 args=['cats']))
+        next_url = NEXT_RE.search(fragment['Link']).group(1)
+        self.assertContains(response, f'data-fragment="{next_url}"')
+        self.assertContains(response, 'posts/feed.js')
+
+    def test_follow_fragment_requires_login(self):
+        """Фрагмент ленты подписок только для авторизованных"""
+        response = self.guest_client.get(reverse('follow_fragment'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_preload_hints(self):
+        """Картинки карточек приходят подсказками preload и во
+        фрагменте, и на полной странице"""
+        Post.objects.filter(text='Запись 4').update(
+            image='posts/cat.jpg',
+            image_variants=json.dumps([{'width': 320,
+                                        'jpeg': 'posts/cat_320.jpg'}]))
+        for url in (reverse('index_fragment'), reverse('index'),
+                    reverse('group', args=['cats'])):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('/media/posts/cat_320.jpg>; rel="preload"; '
+                              'as="image"', response['Link'])
+
+    def test_webp_preload_hint(self):
+        """Если есть WebP, подсказка preload ведет на него с type"""
+        Post.objects.filter(text='Запись 4').update(
+            image='posts/cat.jpg',
+            image_variants=json.dumps([{'width': 320,
+                                        'jpeg': 'posts/cat_320.jpg',
+                                        'webp': 'posts/cat_320.webp'}]))
+        link = self.guest_client.get(reverse('index'))['Link']
+        self.assertIn('</media/posts/cat_320.webp>; rel="preload"; '
+                      'as="image"; type="image/webp"; '
+                      'imagesrcset="/media/posts/cat_320.webp 320w"', link)
+        self.assertNotIn('cat_320.jpg', link)
+
+    def test_routes_before_profiles(self):
+        """Адреса фрагментов не перехватываются страницами профилей"""
+        self.assertEqual(resolve('/fragments/index/').url_name,
+                         'index_fragment')
+        self.assertEqual(resolve('/fragments/follow/').url_name,
+                         'follow_fragment')
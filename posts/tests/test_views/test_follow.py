@@ -1,8 +1,15 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Follow, Post
+from posts import social
+from posts.models import (Follow, Post, TimelineEntry, Tombstone,
+                          UserStats)
 
 
 # тест подписывания пользователей друг на друга
@@ -90,3 +97,312 @@ class FollowUserViewTest(TestCase):
                          response_author.context['paginator'].object_list,
                          'Запись добавлена к неверному пользователю.'
                          )
+
+
+# тест материализованной ленты подписок
+class TimelineViewTest(TestCase):
+    FOLLOWER_USER = 'TestUser_01'
+    AUTHOR_USER = 'TestUser_02'
+
+    def setUp(self):
+        self.follower = get_user_model().objects.create(
+            username=self.FOLLOWER_USER)
+        self.author = get_user_model().objects.create(
+            username=self.AUTHOR_USER)
+        self.old_post = Post.objects.create(text='Старый пост',
+                                            author=self.author)
+
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def follow(self):
+        self.follower_client.get(reverse(
+            'profile_follow', kwargs={'username': self.AUTHOR_USER}))
+
+    def publish(self):
+        self.author_client.post(reverse('new_post'),
+                                data={'text': 'Новый пост'})
+        return Post.objects.get(text='Новый пост')
+
+    def feed(self):
+        response = self.follower_client.get(reverse('follow_index'))
+        return list(response.context['page'])
+
+    def test_follow_backfills_timeline(self):
+        """После подписки в ленте появляются прежние посты автора"""
+        self.follow()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=self.old_post).exists(),
+            'Подписка не заполнила ленту')
+        self.assertIn(self.old_post, self.feed())
+
+    def test_new_post_fans_out(self):
+        """Новый пост раскладывается по лентам подписчиков"""
+        self.follow()
+        post = self.publish()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post).exists(),
+            'Новый пост не попал в ленту подписчика')
+        self.assertEqual(self.feed()[0], post)
+
+    def test_unfollow_prunes_timeline(self):
+        """После отписки посты автора убираются из ленты"""
+        self.follow()
+        self.follower_client.get(reverse(
+            'profile_unfollow', kwargs={'username': self.AUTHOR_USER}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.follower).exists(),
+            'Отписка не очистила ленту')
+        self.assertEqual(self.feed(), [])
+
+    def test_orm_unfollow_prunes_timeline(self):
+        """Удаление подписки не через вью тоже очищает ленту"""
+        self.follow()
+        Follow.objects.get(user=self.follower, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.follower).exists(),
+            'Удаление подписки оставило записи ленты')
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=0)
+    def test_popular_author_read_on_fan_out(self):
+        """Посты популярного автора подмешиваются в ленту при чтении"""
+        self.follow()
+        post = self.publish()
+        self.assertFalse(TimelineEntry.objects.exists(),
+                         'Посты популярного автора не должны раскладываться')
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_orm_post_fans_out(self):
+        """Пост, созданный не через форму, тоже попадает в ленту"""
+        self.follow()
+        post = Post.objects.create(text='Из админки', author=self.author)
+        self.assertEqual(self.feed()[0], post)
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+    def test_author_back_under_threshold(self):
+        """Посты, опубликованные выше порога, остаются в ленте, когда
+        автор опускается до порога"""
+        other = get_user_model().objects.create(username='Other')
+        self.follow()
+        social.follow_many(other, [self.author])
+        post = self.publish()
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        social.unfollow_many(other, [self.author])
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post).exists(),
+            'Посты без раскладки не вернулись в ленту')
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+
+# тест листания ленты подписок: разложенные посты и посты авторов без
+# раскладки сливаются по ключу (pub_date, id)
+@override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1, POSTS_IN_PAGE=3)
+class TimelinePaginationTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.reader = User.objects.create(username='Reader')
+        other = User.objects.create(username='Other')
+        self.pushed = User.objects.create(username='Pushed')
+        self.pulled = User.objects.create(username='Pulled')
+        social.follow_many(self.reader, [self.pushed, self.pulled])
+        social.follow_many(other, [self.pulled])
+        self.posts = [
+            Post.objects.create(text=f'Пост {i}',
+                                author=[self.pushed, self.pulled][i % 2])
+            for i in range(8)]
+        self.client.force_login(self.reader)
+
+    def test_walks_merged_feed(self):
+        """Лента листается вперед и назад без пропусков и повторов"""
+        pages = [self.client.get(reverse('follow_index')).context['page']]
+        while pages[-1].has_next():
+            pages.append(self.client.get(
+                reverse('follow_index'),
+                {'cursor': pages[-1].next_cursor}).context['page'])
+        found = [post for page in pages for post in page]
+        self.assertEqual(found, sorted(
+            self.posts, key=lambda post: (post.pub_date, post.pk),
+            reverse=True))
+        back = self.client.get(reverse('follow_index'), {
+            'cursor': pages[-1].previous_cursor}).context['page']
+        self.assertEqual(list(back), list(pages[-2]))
+
+    def test_reads_timeline_index_range(self):
+        """Страница ленты читает TimelineEntry по ключу, без OR по
+        таблице постов"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('follow_index'))
+        sqls = [query['sql'] for query in queries.captured_queries]
+        self.assertTrue(any(
+            'FROM "posts_timelineentry"' in sql
+            and 'ORDER BY "posts_timelineentry"."pub_date" DESC' in sql
+            for sql in sqls))
+        self.assertFalse(any('FROM "posts_post"' in sql and ' OR ' in sql
+                             and 'ORDER BY' in sql for sql in sqls),
+                         'Страница ленты выбирается по OR двух подзапросов')
+
+
+# тест счетчиков подписок и числа запросов на странице профиля
+class FollowCountersViewTest(TestCase):
+    AUTHOR_USER = 'Author'
+
+    def setUp(self):
+        cache.clear()
+        self.author = get_user_model().objects.create(
+            username=self.AUTHOR_USER)
+        Post.objects.create(text='Тест', author=self.author)
+
+    def follow(self, username):
+        user = get_user_model().objects.create(username=username)
+        client = Client()
+        client.force_login(user)
+        client.get(reverse('profile_follow',
+                           kwargs={'username': self.AUTHOR_USER}))
+        return user, client
+
+    def test_follow_and_unfollow_update_counters(self):
+        """Подписка и отписка меняют счетчики пользователей"""
+        user, client = self.follow('Follower')
+        self.assertEqual(
+            (self.author.stats.followers_count,
+             UserStats.objects.get(user=user).following_count),
+            (1, 1), 'Подписка не изменила счетчики')
+        self.assertTrue(social.is_following(user, self.author))
+
+        client.get(reverse('profile_unfollow',
+                           kwargs={'username': self.AUTHOR_USER}))
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.followers_count, 0,
+                         'Отписка не изменила счетчик')
+        self.assertFalse(social.is_following(user, self.author),
+                         'Кеш подписок не сброшен после отписки')
+
+    def profile_queries(self, client):
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse('profile',
+                               kwargs={'username': self.AUTHOR_USER}))
+        return len(queries)
+
+    def test_profile_queries_do_not_grow_with_followers(self):
+        """Число запросов профиля не зависит от числа подписчиков"""
+        _, client = self.follow('Follower0')
+        self.profile_queries(client)
+        few = self.profile_queries(client)
+        for i in range(1, 6):
+            self.follow(f'Follower{i}')
+        self.profile_queries(client)
+        self.assertEqual(self.profile_queries(client), few,
+                         'Профиль делает запрос на каждого подписчика')
+
+
+# тест уникальности подписок и массовой подписки
+class BulkFollowTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create(username='Reader')
+        self.authors = [get_user_model().objects.create(username=f'A{i}')
+                        for i in range(3)]
+        Post.objects.create(text='Тест', author=self.authors[0])
+
+    def test_duplicate_follow_is_rejected(self):
+        """База не допускает повторную подписку"""
+        Follow.objects.create(user=self.user, author=self.authors[0])
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Follow.objects.create(user=self.user, author=self.authors[0])
+
+    def test_follow_many_is_idempotent(self):
+        """Повторная массовая подписка не создает дублей"""
+        self.assertEqual(social.follow_many(self.user, self.authors), 3)
+        self.assertEqual(social.follow_many(self.user, self.authors), 0)
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(self.user.stats.following_count, 3,
+                         'Массовая подписка не изменила счетчик')
+        self.assertTrue(TimelineEntry.objects.filter(user=self.user).exists(),
+                        'Массовая подписка не заполнила ленту')
+
+    def test_follow_many_inserts_with_one_statement(self):
+        """Строки подписок вставляются одним запросом"""
+        with CaptureQueriesContext(connection) as queries:
+            social.follow_many(self.user, self.authors)
+        inserts = [query for query in queries.captured_queries
+                   if query['sql'].startswith('INSERT')
+                   and '"posts_follow"' in query['sql']]
+        self.assertEqual(len(inserts), 1)
+
+    def test_unfollow_many(self):
+        """Массовая отписка удаляет подписки и очищает ленту"""
+        social.follow_many(self.user, self.authors)
+        self.assertEqual(social.unfollow_many(self.user, self.authors[:2]),
+                         2)
+        self.assertEqual(
+            list(Follow.objects.filter(user=self.user).values_list(
+                'author', flat=True)),
+            [self.authors[2].pk])
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+        self.user.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.following_count, 1)
+
+    def test_follow_many_counts_inserted_rows(self):
+        """Считаются только строки, вставленные этим запросом: подписку,
+        которую успел вставить другой запрос, второй раз не считаем"""
+        Follow.objects.bulk_create([Follow(user=self.user,
+                                           author=self.authors[0])])
+        author_ids = [author.pk for author in self.authors]
+        self.assertEqual(sorted(social._insert_follows(self.user.pk,
+                                                       author_ids)),
+                         author_ids[1:])
+        self.assertEqual(social._insert_follows(self.user.pk, author_ids),
+                         [])
+
+    def test_insert_follows_without_returning(self):
+        """SQLite до 3.35 без RETURNING: подписки вставляются по одной"""
+        Follow.objects.bulk_create([Follow(user=self.user,
+                                           author=self.authors[0])])
+        author_ids = [author.pk for author in self.authors]
+        with mock.patch.object(connection.Database, 'sqlite_version_info',
+                               (3, 34, 1)), \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(social._insert_follows(self.user.pk,
+                                                    author_ids),
+                             author_ids[1:])
+        self.assertFalse(any('RETURNING' in query['sql']
+                             for query in queries.captured_queries))
+
+    def test_bulk_follow_chunks_params(self):
+        """Параметров в одном запросе не больше предела базы"""
+        author_ids = [author.pk for author in self.authors]
+        with mock.patch.object(connection.features, 'max_query_params', 6), \
+                CaptureQueriesContext(connection) as queries:
+            inserted = social._insert_follows(self.user.pk, author_ids)
+        self.assertEqual(sorted(inserted), author_ids)
+        inserts = [query for query in queries.captured_queries
+                   if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+
+    def test_unfollow_many_deletes_with_one_statement(self):
+        """Подписки удаляются одним DELETE, счетчики авторов и следы
+        для синхронизации правятся пачкой"""
+        social.follow_many(self.user, self.authors)
+        with CaptureQueriesContext(connection) as queries:
+            social.unfollow_many(self.user, self.authors)
+        deletes = [query for query in queries.captured_queries
+                   if query['sql'].startswith('DELETE')
+                   and 'FROM "posts_follow"' in query['sql']]
+        self.assertEqual(len(deletes), 1)
+        updates = [query for query in queries.captured_queries
+                   if query['sql'].startswith('UPDATE')
+                   and '"posts_userstats"' in query['sql']]
+        self.assertEqual(len(updates), 2,
+                         'Счетчики правятся отдельно для каждой подписки')
+        self.assertEqual(
+            list(UserStats.objects.filter(
+                user__in=self.authors).values_list('followers_count',
+                                                   flat=True)),
+            [0, 0, 0])
+        self.assertEqual(Tombstone.objects.filter(
+            kind=Tombstone.FOLLOW, user_id=self.user.pk).count(), 3)
+        self.assertEqual(social.following_ids(self.user), frozenset())
@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.fragments import fragment_key
+from posts.models import Comment, Group, Post
+
+
+# класс тестирования кеша карточек постов
+class PostFragmentCacheTest(TestCase):
+    AUTH_USER_NAME = 'TestUser'
+    GROUP_SLUG = 'test-group'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(
+            username=cls.AUTH_USER_NAME)
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug=cls.GROUP_SLUG)
+        cls.post = Post.objects.create(text='Тестовая запись',
+                                       author=cls.user,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.group_url = reverse('group', kwargs={'slug': self.GROUP_SLUG})
+
+    def test_fragment_is_cached(self):
+        """Карточка поста попадает в кеш при первой отрисовке"""
+        self.guest_client.get(self.group_url)
+        self.assertIsNotNone(cache.get(fragment_key(self.post.pk, False)),
+                             'Карточка поста не закеширована')
+
+    def test_owner_fragment_has_edit_link(self):
+        """Автор и гость получают разные варианты карточки"""
+        self.guest_client.get(self.group_url)
+        self.authorized_client.get(self.group_url)
+        edit_url = reverse('post_edit', args=[self.AUTH_USER_NAME,
+                                              self.post.pk])
+        self.assertNotIn(edit_url, cache.get(fragment_key(self.post.pk,
+                                                          False)))
+        self.assertIn(edit_url, cache.get(fragment_key(self.post.pk, True)))
+
+    def test_comment_invalidates_fragment(self):
+        """Новый комментарий сбрасывает карточку поста"""
+        self.guest_client.get(self.group_url)
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Комментарий')
+        self.assertIsNone(cache.get(fragment_key(self.post.pk, False)),
+                          'Комментарий не сбросил кеш карточки')
+
+    def test_group_rename_invalidates_fragment(self):
+        """Изменение группы сбрасывает карточки ее постов"""
+        self.guest_client.get(self.group_url)
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertIsNone(cache.get(fragment_key(self.post.pk, False)),
+                          'Изменение группы не сбросило кеш карточки')
+
+    def test_fragments_written_in_one_batch(self):
+        """Отрисованные карточки страницы пишутся одним set_many"""
+        Post.objects.create(text='Вторая запись', author=self.user,
+                            group=self.group)
+        with mock.patch.object(cache, 'set',
+                               wraps=cache.set) as cache_set, \
+                mock.patch.object(cache, 'set_many',
+                                  wraps=cache.set_many) as cache_set_many:
+            self.guest_client.get(self.group_url)
+        fragment_keys = [call for call in cache_set.call_args_list
+                         if call[0][0].startswith('post_item:')]
+        self.assertEqual(fragment_keys, [])
+        cache_set_many.assert_called_once()
+        self.assertEqual(len(cache_set_many.call_args[0][0]), 2)
+
+    def test_group_delete_invalidates_fragment(self):
+        """Удаление группы сбрасывает карточки ее постов"""
+        group = Group.objects.create(title='Временная', slug='temporary')
+        post = Post.objects.create(text='Запись', author=self.user,
+                                   group=group)
+        self.guest_client.get(reverse('group', args=['temporary']))
+        self.assertIsNotNone(cache.get(fragment_key(post.pk, False)))
+        group.delete()
+        self.assertIsNone(cache.get(fragment_key(post.pk, False)),
+                          'Удаление группы не сбросило кеш карточки')
+
+    def test_author_rename_invalidates_fragment(self):
+        """Смена имени автора сбрасывает карточки его постов"""
+        self.guest_client.get(self.group_url)
+        author = get_user_model().objects.get(pk=self.user.pk)
+        author.last_login = author.date_joined
+        author.save(update_fields=['last_login'])
+        self.assertIsNotNone(cache.get(fragment_key(self.post.pk, False)))
+        author.first_name = 'Лев'
+        author.save()
+        self.assertIsNone(cache.get(fragment_key(self.post.pk, False)),
+                          'Смена имени автора не сбросила кеш карточки')
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -28,6 +29,10 @@ class PostImageViewTest(TestCase):
                          b'\x0A\x00\x3B'
                          )
 
+        # картинки хранятся под именем - хешем содержимого
+        digest = hashlib.sha256(cls.small_gif).hexdigest()
+        cls.expected_name = f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
+
         cls.uploaded = SimpleUploadedFile(
             name='small.gif',
             content=cls.small_gif,
@@ -60,7 +65,7 @@ class PostImageViewTest(TestCase):
         cache.clear()
         response = self.guest_client.get(reverse('index'))
         response_data_image = response.context['page'][0].image
-        expected = f'posts/{self.uploaded.name}'
+        expected = self.expected_name
 
         self.assertEqual(response_data_image,
                          expected, 'Изображение переданные'
@@ -76,7 +81,7 @@ class PostImageViewTest(TestCase):
             }))
 
         response_data_image = response.context['page'][0].image
-        expected = f'posts/{self.uploaded.name}'
+        expected = self.expected_name
 
         self.assertEqual(response_data_image,
                          expected, 'Изображение переданные'
@@ -92,7 +97,7 @@ class PostImageViewTest(TestCase):
                                                          }))
 
         response_data_image = response.context['page'][0].image
-        expected = f'posts/{self.uploaded.name}'
+        expected = self.expected_name
 
         self.assertEqual(response_data_image,
                          expected, 'Изображение переданные'
@@ -109,7 +114,7 @@ class PostImageViewTest(TestCase):
                                     }))
 
         response_data_image = response.context['post'].image
-        expected = f'posts/{self.uploaded.name}'
+        expected = self.expected_name
 
         self.assertEqual(response_data_image,
                          expected, 'Изображение переданное'
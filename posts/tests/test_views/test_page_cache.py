@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+
+# класс тестирования кеша целых страниц для анонимов
+@override_settings(FULL_PAGE_CACHE_TIMEOUT=60)
+class FullPageCacheTest(TestCase):
+    AUTH_USER_NAME = 'TestUser'
+    GROUP_SLUG = 'test-group'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(
+            username=cls.AUTH_USER_NAME)
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug=cls.GROUP_SLUG)
+        cls.post = Post.objects.create(text='Тестовая запись',
+                                       author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.post_url = reverse('post', args=[self.AUTH_USER_NAME,
+                                              self.post.pk])
+
+    def test_anonymous_pages_cached(self):
+        """Повторный запрос анонима отдается из кеша"""
+        urls = [
+            reverse('index'),
+            reverse('group', args=[self.GROUP_SLUG]),
+            reverse('profile', args=[self.AUTH_USER_NAME]),
+            self.post_url,
+            reverse('about:author'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.guest_client.get(url)['X-Page-Cache'], 'miss')
+                self.assertEqual(
+                    self.guest_client.get(url)['X-Page-Cache'], 'hit')
+
+    def test_authorized_pages_not_cached(self):
+        """Страницы для авторизованных не кешируются"""
+        self.authorized_client.get(reverse('index'))
+        response = self.authorized_client.get(reverse('index'))
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_comment_purges_post_pages(self):
+        """Комментарий сбрасывает страницы, где показан пост"""
+        group_url = reverse('group', args=[self.GROUP_SLUG])
+        self.guest_client.get(self.post_url)
+        self.guest_client.get(group_url)
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Новый комментарий')
+        response = self.guest_client.get(self.post_url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Новый комментарий')
+        self.assertEqual(self.guest_client.get(group_url)['X-Page-Cache'],
+                         'miss')
+
+    def test_new_post_purges_only_affected_pages(self):
+        """Новый пост сбрасывает ленту, но не чужие страницы"""
+        other_group = Group.objects.create(title='Другая группа',
+                                           slug='other-group')
+        other_url = reverse('group', args=[other_group.slug])
+        self.guest_client.get(reverse('index'))
+        self.guest_client.get(other_url)
+        Post.objects.create(text='Свежая запись', author=self.user,
+                            group=self.group)
+        self.assertContains(self.guest_client.get(reverse('index')),
+                            'Свежая запись')
+        self.assertEqual(self.guest_client.get(other_url)['X-Page-Cache'],
+                         'hit')
+
+    def test_cached_page_not_modified(self):
+        """Закешированная страница отвечает 304 на совпадающий ETag"""
+        etag = self.guest_client.get(self.post_url)['ETag']
+        response = self.guest_client.get(self.post_url,
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_author_rename_purges_feeds(self):
+        """Смена имени автора сбрасывает ленты с его карточками"""
+        urls = [reverse('index'), reverse('group', args=[self.GROUP_SLUG])]
+        for url in urls:
+            self.guest_client.get(url)
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'miss')
+                self.assertContains(response, 'Новое имя')
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from posts.templatetags.pagination import page_window_numbers
+
+
+# класс тестирования навигации по номерам страниц
+@override_settings(POSTS_IN_PAGE=1, PAGINATOR_WINDOW=2)
+class PageWindowTest(TestCase):
+    PAGES = 30
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model().objects.create(username='TestUser')
+        Post.objects.bulk_create([Post(text=f'Запись {i}', author=user)
+                                  for i in range(cls.PAGES)])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_window_numbers(self):
+        """Окно содержит первую, последнюю и соседние страницы"""
+        cases = {
+            (1, 1): [1],
+            (1, 10): [1, 2, 3, None, 10],
+            (5, 10): [1, 2, 3, 4, 5, 6, 7, None, 10],
+            (15, 30): [1, None, 13, 14, 15, 16, 17, None, 30],
+            (30, 30): [1, None, 28, 29, 30],
+        }
+        for (number, num_pages), expected in cases.items():
+            with self.subTest(number=number, num_pages=num_pages):
+                self.assertEqual(
+                    page_window_numbers(number, num_pages, 2), expected)
+
+    def test_approximate_count_hides_last(self):
+        """При приблизительном числе записей последней страницы нет"""
+        self.assertEqual(page_window_numbers(15, 30, 2, approximate=True),
+                         [1, None, 13, 14, 15, 16, 17, None])
+
+    def test_page_links_are_bounded(self):
+        """Страница ленты содержит только окно ссылок"""
+        response = self.guest_client.get(reverse('index') + '?page=15')
+        content = response.content.decode()
+        self.assertEqual(content.count('class="page-link" href="?page='), 6)
+        self.assertIn('href="?page=16">Следующая', content)
+        self.assertIn('href="?page=14">&laquo;', content)
+        self.assertNotIn('?page=20"', content)
@@ -1,9 +1,12 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Post
+from posts.models import Comment, Post
+from posts.paginator import encode_cursor
 
 
 class PaginatorViewsTest(TestCase):
@@ -38,3 +41,96 @@ class PaginatorViewsTest(TestCase):
             len(response.context['page'].object_list),
             self.POSTS_COUNT - settings.POSTS_IN_PAGE
         )
+
+
+class KeysetPaginatorViewsTest(TestCase):
+    """Тестируем листание ленты курсором ?cursor="""
+
+    POSTS_COUNT = 25
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='TestUser')
+
+        # у части записей совпадает pub_date, порядок держит id
+        Post.objects.bulk_create([Post(
+            text=f'Тестовое сообщение{i}',
+            author=cls.user)
+            for i in range(cls.POSTS_COUNT)])
+
+    def test_cursor_walks_all_posts_once(self):
+        """Проход курсором вперед выдает каждую запись ровно один раз"""
+        seen = []
+        url = reverse('index')
+        while url:
+            response = self.client.get(url)
+            page = response.context['page']
+            seen.extend(post.pk for post in page)
+            url = (reverse('index') + f'?cursor={page.next_cursor}'
+                   if page.has_next() else None)
+
+        expected = list(Post.objects.order_by('-pub_date', '-id')
+                        .values_list('pk', flat=True))
+        self.assertEqual(seen, expected,
+                         'Курсорная паджинация теряет или дублирует записи')
+
+    def test_cursor_previous_returns_same_page(self):
+        """Переход назад возвращает предыдущую страницу"""
+        first = self.client.get(reverse('index')).context['page']
+        second = self.client.get(
+            reverse('index') + f'?cursor={first.next_cursor}'
+        ).context['page']
+        back = self.client.get(
+            reverse('index') + f'?cursor={second.previous_cursor}'
+        ).context['page']
+
+        self.assertEqual([post.pk for post in back],
+                         [post.pk for post in first])
+        self.assertFalse(back.has_previous())
+
+    def test_cursor_page_runs_no_count(self):
+        """Страница по курсору не выполняет COUNT(*)"""
+        first = self.client.get(reverse('index')).context['page']
+        url = reverse('index') + f'?cursor={first.next_cursor}'
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper(),
+                             'Страница по курсору считает все записи')
+            self.assertNotIn('OFFSET', query['sql'].upper(),
+                             'Страница по курсору использует OFFSET')
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор открывает первую страницу"""
+        response = self.client.get(reverse('index') + '?cursor=broken')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page'].has_previous())
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        """Курсор с подделанными значениями не роняет ни одну ленту"""
+        post = Post.objects.first()
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        tampered = [
+            ['2020-01-01T00:00:00+00:00', 'x'],
+            ['2020-13-45T00:00:00', 1],
+            [{'a': 1}, 1],
+            ['2020-01-01T00:00:00', [1]],
+            [None, 1],
+        ]
+        urls = [
+            reverse('index'),
+            reverse('index_fragment'),
+            reverse('api_v1:post_list'),
+            reverse('comments_fragment', args=[self.user.username, post.pk]),
+        ]
+        for values in tampered:
+            for url in urls:
+                with self.subTest(values=values, url=url):
+                    response = self.client.get(
+                        url, {'cursor': encode_cursor(values)})
+                    self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            reverse('post', args=[self.user.username, post.pk]),
+            {'comments': encode_cursor(tampered[0])})
+        self.assertEqual(response.status_code, 200)
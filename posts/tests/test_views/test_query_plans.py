@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import social
+from posts.models import Group, Post
+
+
+# регрессионный тест планов запросов лент: выборка должна идти по
+# составному индексу, без отдельной сортировки
+class FeedQueryPlanTest(TestCase):
+    AUTH_USER_NAME = 'TestUser'
+    GROUP_SLUG = 'test-group'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(
+            username=cls.AUTH_USER_NAME)
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug=cls.GROUP_SLUG)
+        Post.objects.bulk_create([Post(text=f'Тест{i}', author=cls.user,
+                                       group=cls.group)
+                                  for i in range(15)])
+        cls.follower = get_user_model().objects.create(username='Follower')
+        social.follow_many(cls.follower, [cls.user])
+
+    def feed_query(self, url, client=None, table='posts_post'):
+        cache.clear()
+        client = client or self.client
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        feed = [query['sql'] for query in queries.captured_queries
+                if query['sql'].startswith('SELECT')
+                and f'FROM "{table}"' in query['sql']
+                and 'ORDER BY' in query['sql']]
+        self.assertTrue(feed, f'Запрос ленты {url} не найден')
+        return feed[0]
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql)
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    def test_feeds_use_composite_indexes(self):
+        """Ленты читаются по составным индексам без сортировки"""
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('План проверяется только для SQLite и PostgreSQL')
+        follower_client = Client()
+        follower_client.force_login(self.follower)
+        # url -> (индекс, клиент, таблица выборки ленты)
+        feeds = {
+            reverse('index'): ('post_pub_date_idx', None, 'posts_post'),
+            reverse('index') + '?page=2': ('post_pub_date_idx', None,
+                                           'posts_post'),
+            reverse('group', kwargs={'slug': self.GROUP_SLUG}):
+                ('post_group_pub_date_idx', None, 'posts_post'),
+            reverse('profile', kwargs={'username': self.AUTH_USER_NAME}):
+                ('post_author_pub_date_idx', None, 'posts_post'),
+            reverse('follow_index'): ('timeline_user_pub_date_idx',
+                                      follower_client,
+                                      'posts_timelineentry'),
+        }
+        for url, (index_name, client, table) in feeds.items():
+            with self.subTest(url=url):
+                plan = self.explain(self.feed_query(url, client, table))
+                self.assertIn(index_name, plan,
+                              f'Лента {url} не использует {index_name}:\n'
+                              f'{plan}')
+                self.assertNotIn('TEMP B-TREE', plan,
+                                 f'Лента {url} сортируется отдельно:\n'
+                                 f'{plan}')
+                self.assertNotIn('Sort', plan.split('\n')[0],
+                                 f'Лента {url} сортируется отдельно:\n'
+                                 f'{plan}')
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from yatube import replicas
+
+
+# класс тестирования чтения ленты с реплик. Реплика - алиас replica,
+# зеркало тестовой базы, поэтому данные должны быть закоммичены
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRoutingTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+    AUTH_USER_NAME = 'TestUser'
+    AUTHOR_NAME = 'Author'
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create(
+            username=self.AUTH_USER_NAME)
+        self.author = get_user_model().objects.create(
+            username=self.AUTHOR_NAME)
+        Post.objects.create(text='Тестовая запись', author=self.author)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get(self, url):
+        """Запрос страницы; возвращает SQL, ушедший в основную базу
+        и в реплику"""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return ([query['sql'] for query in primary.captured_queries],
+                [query['sql'] for query in replica.captured_queries])
+
+    def test_read_views_use_replica(self):
+        """Лента и профиль читаются с реплики"""
+        for url in (reverse('index'), reverse('profile',
+                                              args=[self.AUTHOR_NAME])):
+            with self.subTest(url=url):
+                cache.clear()
+                primary, replica = self.get(url)
+                self.assertTrue(any('"posts_post"' in sql
+                                    for sql in replica),
+                                'Посты прочитаны не с реплики')
+                self.assertFalse(any('"posts_post"' in sql
+                                     for sql in primary),
+                                 'Посты прочитаны из основной базы')
+        self.assertIsNone(replicas.current_replica(),
+                          'Реплика осталась выбранной после запроса')
+
+    def test_write_pins_primary(self):
+        """После подписки пользователь читает из основной базы"""
+        response = self.authorized_client.get(
+            reverse('profile_follow', args=[self.AUTHOR_NAME]))
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        primary, replica = self.get(reverse('follow_index'))
+        self.assertEqual(replica, [])
+        self.assertTrue(any('"posts_post"' in sql for sql in primary))
+
+    def test_router_writes_to_primary(self):
+        """Запись всегда идет в основную базу"""
+        router = replicas.ReplicaRouter()
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+        self.assertIsNone(router.allow_migrate('default', 'posts'))
+
+    @override_settings(REPLICA_DATABASES=['missing'])
+    def test_unavailable_replica_falls_back(self):
+        """Недоступная реплика не используется"""
+        self.assertIsNone(replicas.choose_replica())
+        primary, replica = self.get(reverse('index'))
+        self.assertEqual(replica, [])
+        self.assertTrue(any('"posts_post"' in sql for sql in primary))
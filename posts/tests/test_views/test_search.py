@@ -0,0 +1,84 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+from posts.paginator import encode_cursor
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Тест индекса FTS5 для SQLite')
+class SearchViewTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='TestUser')
+        cls.group = Group.objects.create(title='Любители кошек',
+                                         slug='cats')
+        cls.cat_post = Post.objects.create(text='Мой кот спит на диване',
+                                           author=cls.user)
+        cls.dog_post = Post.objects.create(text='Собака гуляет в парке',
+                                           author=cls.user)
+        Comment.objects.create(post=cls.dog_post, author=cls.user,
+                               text='Наши коты не любят пылесосы')
+
+    def search(self, query, cursor=None):
+        params = {'q': query}
+        if cursor:
+            params['cursor'] = cursor
+        return self.client.get(reverse('search'), params).context
+
+    def test_russian_morphology(self):
+        """Поиск находит другие словоформы"""
+        context = self.search('котами')
+        self.assertIn(self.cat_post, list(context['page']))
+
+    def test_comment_match_returns_post(self):
+        """Совпадение в комментарии выдает пост"""
+        context = self.search('пылесосом')
+        self.assertEqual(list(context['page']), [self.dog_post])
+
+    def test_group_title_found(self):
+        """Поиск находит группы по названию"""
+        context = self.search('любителей')
+        self.assertIn(self.group, list(context['groups']))
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при изменении и удалении поста"""
+        post = Post.objects.create(text='Жираф', author=self.user)
+        self.assertEqual(list(self.search('жирафы')['page']), [post])
+        post.text = 'Слон'
+        post.save()
+        self.assertEqual(list(self.search('жирафы')['page']), [])
+        self.assertEqual(list(self.search('слоны')['page']), [post])
+        post.delete()
+        self.assertEqual(list(self.search('слоны')['page']), [])
+
+    def test_ranked_keyset_pagination(self):
+        """Выдача листается курсором без повторов"""
+        Post.objects.bulk_create([Post(text=f'Попугай номер {i}',
+                                       author=self.user)
+                                  for i in range(15)])
+        for post in Post.objects.filter(text__startswith='Попугай'):
+            post.save()
+        first = self.search('попугаи')['page']
+        second = self.search('попугаи', first.next_cursor)['page']
+        found = [post.pk for post in first] + [post.pk for post in second]
+        self.assertEqual(len(found), 15)
+        self.assertEqual(len(set(found)), 15)
+        self.assertFalse(second.has_next())
+
+    def test_query_syntax_is_escaped(self):
+        """Служебные символы FTS5 в запросе не ломают поиск"""
+        response = self.client.get(reverse('search'), {'q': '"кот" OR *'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_tampered_cursor_ignored(self):
+        """Подделанный курсор открывает выдачу с начала"""
+        for values in ([{'a': 1}, 1], ['x', 1], [1.5, '2'], [1.5, True]):
+            with self.subTest(values=values):
+                page = self.search('кот', encode_cursor(values))['page']
+                self.assertIn(self.cat_post, list(page))
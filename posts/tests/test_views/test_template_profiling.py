@@ -0,0 +1,82 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.template.base import Template
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from yatube import template_profiling
+
+
+# класс тестирования профилирования шаблонов
+@override_settings(TEMPLATE_PROFILING=True)
+class TemplateProfilingTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model().objects.create(username='TestUser')
+        Post.objects.create(text='Тестовая запись', author=user)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.addCleanup(template_profiling.uninstall)
+
+    def test_report_lists_includes(self):
+        """В отчет попадают страница и подключенные шаблоны"""
+        with self.assertLogs('yatube.templates', 'INFO') as logs:
+            self.guest_client.get(reverse('index'))
+        report = '\n'.join(logs.output)
+        for name in ('index.html', 'posts/post_item.html', 'nav.html'):
+            with self.subTest(name=name):
+                self.assertIn(name, report)
+
+    def test_disabled_by_default(self):
+        """Без TEMPLATE_PROFILING отчет не пишется и Template._render
+        не подменяется"""
+        original = Template._render
+        with self.settings(TEMPLATE_PROFILING=False):
+            client = Client()
+            with self.assertRaises(AssertionError):
+                with self.assertLogs('yatube.templates', 'INFO'):
+                    client.get(reverse('index'))
+        self.assertIs(Template._render, original)
+
+    def test_uninstall_restores_render(self):
+        """uninstall() возвращает исходный Template._render"""
+        original = Template._render
+        self.guest_client.get(reverse('index'))
+        self.assertIsNot(Template._render, original)
+        template_profiling.uninstall()
+        self.assertIs(Template._render, original)
+
+
+# запросы к реплике считаются вместе с запросами к основной базе;
+# реплика - зеркало тестовой базы и видит только закоммиченные данные
+@override_settings(TEMPLATE_PROFILING=True, REPLICA_DATABASES=['replica'])
+class TemplateProfilingReplicaTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create(username='TestUser')
+        Post.objects.create(text='Тестовая запись', author=user)
+        self.addCleanup(template_profiling.uninstall)
+
+    def test_replica_queries_counted(self):
+        """В отчет попадают запросы ко всем базам"""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica, \
+                self.assertLogs('yatube.templates', 'INFO') as logs:
+            Client().get(reverse('index'))
+        self.assertTrue(replica.captured_queries)
+        total = int(re.search(r'GET /: (\d+) queries',
+                              logs.output[0]).group(1))
+        self.assertEqual(total, len(primary.captured_queries)
+                         + len(replica.captured_queries))
@@ -0,0 +1,106 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import features
+
+from posts import thumbnails
+from posts.models import Post
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
+
+
+# класс тестирования фоновой нарезки картинок
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailPipelineTest(TestCase):
+    AUTH_USER_NAME = 'TestUser'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(
+            username=cls.AUTH_USER_NAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Тестовая запись', author=self.user,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF,
+                                     content_type='image/gif'))
+        self.profile_url = reverse('profile',
+                                   kwargs={'username': self.AUTH_USER_NAME})
+
+    def test_feed_shows_placeholder_until_variants_ready(self):
+        """Пока вариантов нет, лента не нарезает картинку сама"""
+        response = Client().get(self.profile_url)
+        self.assertNotContains(response, '<picture>')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.variants, [])
+
+    def test_generated_variants_stored_on_post(self):
+        """Нарезка сохраняет варианты в посте и сбрасывает карточку"""
+        Client().get(self.profile_url)
+        thumbnails.generate(self.post.image.name)
+        self.post.refresh_from_db()
+        variant = self.post.variants[0]
+        self.assertEqual(variant['width'], min(settings.POST_IMAGE_WIDTHS))
+        self.assertTrue(variant['jpeg'].endswith('.jpg'))
+
+        response = Client().get(self.profile_url)
+        self.assertContains(response, 'srcset=')
+        self.assertContains(response, variant['jpeg'])
+
+    @override_settings(FULL_PAGE_CACHE_TIMEOUT=60)
+    def test_generated_variants_purge_cached_pages(self):
+        """Нарезка сбрасывает закешированные страницы с заглушкой"""
+        post_url = reverse('post', args=[self.AUTH_USER_NAME, self.post.pk])
+        for url in (self.profile_url, post_url, reverse('index')):
+            with self.subTest(url=url):
+                response = Client().get(url)
+                self.assertNotContains(response, '<picture>')
+                self.assertEqual(Client().get(url)['X-Page-Cache'], 'hit')
+        thumbnails.generate(self.post.image.name)
+        for url in (self.profile_url, post_url, reverse('index')):
+            with self.subTest(url=url):
+                self.assertContains(Client().get(url), '<picture>')
+
+    def test_variants_do_not_upscale_beyond_one_width(self):
+        """Маленькая картинка не растягивается на все ширины"""
+        thumbnails.generate(self.post.image.name)
+        self.post.refresh_from_db()
+        self.assertEqual(len(self.post.variants), 1)
+
+    @override_settings(POST_IMAGE_WIDTHS=(320, 640))
+    def test_webp_variant_when_supported(self):
+        """Если Pillow умеет WebP, создается и WebP-вариант"""
+        if not features.check('webp'):
+            self.skipTest('Pillow собран без WebP')
+        thumbnails.generate(self.post.image.name)
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.variants[0]['webp'].endswith('.webp'))
+
+    def test_warm_thumbnails_command(self):
+        """Команда warm_thumbnails нарезает картинки старых постов"""
+        call_command('warm_thumbnails', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertNotEqual(self.post.variants, [],
+                            'warm_thumbnails не нарезал картинку')
@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from yatube import pagecache
+
+from . import conditional, fragments
+from .models import Post
+from .storage import post_image_storage
+
+logger = logging.getLogger(__name__)
+
+# Картинки для ленты нарезаются заранее в пуле потоков, а не при первой
+# отрисовке карточки. Pillow отпускает GIL на декодировании и ресайзе,
+# поэтому пул не мешает воркеру отвечать на запросы. Для каждой ширины из
+# POST_IMAGE_WIDTHS сохраняются JPEG и, если Pillow умеет, WebP. Список
+# вариантов пишется в Post.image_variants, пока его нет, карточка
+# показывает заглушку.
+ASPECT_RATIO = 960 / 339
+VARIANTS_DIR = 'posts/variants'
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def _formats():
+    if features.check('webp'):
+        return (('jpeg', 'jpg'), ('webp', 'webp'))
+    return (('jpeg', 'jpg'),)
+
+
+# ширины до первой, не меньшей исходной картинки: увеличиваем не больше
+# одного варианта
+def _widths(source_width):
+    widths = []
+    for width in sorted(settings.POST_IMAGE_WIDTHS):
+        widths.append(width)
+        if width >= source_width:
+            break
+    return widths
+
+
+def _variant_name(image_name, width, extension):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{VARIANTS_DIR}/{stem}_{width}.{extension}'
+
+
+def _save(name, content):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(content))
+
+
+def make_variants(image_name):
+    with post_image_storage.open(image_name) as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+    variants = []
+    for width in _widths(image.width):
+        height = round(width / ASPECT_RATIO)
+        resized = ImageOps.fit(image, (width, height),
+                               method=Image.LANCZOS)
+        variant = {'width': width}
+        for image_format, extension in _formats():
+            buffer = BytesIO()
+            resized.save(buffer, image_format,
+                         quality=settings.POST_IMAGE_QUALITY)
+            variant[image_format] = _save(
+                _variant_name(image_name, width, extension),
+                buffer.getvalue(),
+            )
+        variants.append(variant)
+    return variants
+
+
+# варианты одной и той же картинки нарезаются один раз: повторная
+# загрузка того же файла получает уже готовый список
+def generate(image_name, force=False):
+    posts = Post.objects.filter(image=image_name)
+    variants = None
+    if not force:
+        variants = posts.exclude(image_variants='').values_list(
+            'image_variants', flat=True).first()
+    if variants is None:
+        variants = json.dumps(make_variants(image_name))
+    rows = list(posts.values_list('pk', 'author_id', 'group_id'))
+    post_ids = [pk for pk, _, _ in rows]
+    # updated_at двигает Last-Modified страниц и отдает посты синхронизации
+    Post.objects.filter(pk__in=post_ids).update(image_variants=variants,
+                                                updated_at=timezone.now())
+    fragments.invalidate(*post_ids)
+    tags = set()
+    for pk, author_id, group_id in rows:
+        tags.update(conditional.post_tags(pk, author_id, group_id))
+    conditional.bump_version(*tags)
+    # закешированные страницы с заглушкой вместо картинки
+    keys = {'index'}
+    for pk, author_id, group_id in rows:
+        keys.update((f'post:{pk}', f'author:{author_id}'))
+        if group_id is not None:
+            keys.add(f'group:{group_id}')
+    pagecache.purge(*keys)
+    return variants
+
+
+def _run(image_name):
+    try:
+        generate(image_name)
+    except Exception:
+        logger.exception('Не удалось нарезать картинку %s', image_name)
+    finally:
+        _pending.discard(image_name)
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def _submit(image_name):
+    if settings.THUMBNAIL_WORKERS == 0:
+        generate(image_name)
+        return
+    if image_name in _pending:
+        return
+    _pending.add(image_name)
+    _get_executor().submit(_run, image_name)
+
+
+def delete_variants(image_name):
+    for width in settings.POST_IMAGE_WIDTHS:
+        for _, extension in _formats():
+            name = _variant_name(image_name, width, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+
+
+# ставим нарезку в очередь после коммита транзакции с постом
+def schedule(post):
+    if not post.image:
+        return
+    image_name = post.image.name
+    transaction.on_commit(lambda: _submit(image_name))
+
+
+# данные для <picture>: srcset по форматам и запасной src
+def picture(post):
+    variants = post.variants
+    if not variants:
+        return None
+    srcsets = {}
+    for image_format, _ in _formats():
+        srcsets[image_format] = ', '.join(
+            f'{default_storage.url(variant[image_format])} '
+            f'{variant["width"]}w'
+            for variant in variants if image_format in variant
+        )
+    fallback = min(variants,
+                   key=lambda variant: abs(variant['width'] - 960))
+    return {
+        'src': default_storage.url(fallback['jpeg']),
+        'webp_src': (default_storage.url(fallback['webp'])
+                     if 'webp' in fallback else ''),
+        'jpeg_srcset': srcsets['jpeg'],
+        'webp_srcset': srcsets.get('webp', ''),
+        'sizes': settings.POST_IMAGE_SIZES,
+    }
@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginator import KeysetPage, KeysetPaginator, decode_cursor
+
+# Лента подписок строится при записи (fan-out-on-write): новый пост сразу
+# раскладывается по TimelineEntry подписчиков. Для авторов, у которых
+# подписчиков больше TIMELINE_FANOUT_MAX_FOLLOWERS, раскладка не делается,
+# их посты подмешиваются при чтении (fan-out-on-read). Когда такой автор
+# опускается до порога, его посты раскладываются по лентам заново.
+
+
+def is_fanout_author(author):
+    return not UserStats.objects.filter(
+        user=author,
+        followers_count__gt=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def _entries(user_ids, posts):
+    return [TimelineEntry(user_id=user_id, post_id=post.pk,
+                          pub_date=post.pub_date)
+            for user_id in user_ids for post in posts]
+
+
+# раскладываем новый пост по лентам подписчиков автора
+def fan_out(post):
+    if not is_fanout_author(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id, user__isnull=False).values_list(
+            'user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        _entries(follower_ids, [post]),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+# после подписки добавляем в ленту уже опубликованные посты авторов
+def backfill(user, *authors):
+    authors = [author for author in authors if is_fanout_author(author)]
+    if not authors:
+        return
+    posts = Post.objects.filter(author__in=authors).only(
+        'pk', 'pub_date').order_by()
+    TimelineEntry.objects.bulk_create(
+        _entries([user.pk], posts.iterator()),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+# авторы, у которых после отписки число подписчиков опустилось до
+# порога: их посты без раскладки нужно разложить, иначе они пропадут
+# из лент при чтении
+def restore_fan_out(*author_ids):
+    crossed = UserStats.objects.filter(
+        user_id__in=author_ids,
+        followers_count=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+    ).select_related('user')
+    for stats in crossed:
+        followers = Follow.objects.filter(
+            author_id=stats.user_id, user__isnull=False).select_related(
+                'user')
+        for follow in followers:
+            backfill(follow.user, stats.user)
+
+
+# после отписки убираем посты авторов из ленты
+def prune(user, *authors):
+    TimelineEntry.objects.filter(user=user,
+                                 post__author__in=authors).delete()
+
+
+def _pull_authors(user):
+    return UserStats.objects.filter(
+        user__following__user=user,
+        followers_count__gt=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+    ).values('user_id')
+
+
+# посты ленты подписок пользователя одним набором: для ETag, счетчика
+# и синхронизации. Листается лента через TimelinePaginator
+def timeline_posts(user):
+    pull_authors = _pull_authors(user)
+    pushed = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=pushed) | Q(author__in=pull_authors)
+    )
+
+
+class TimelinePaginator(KeysetPaginator):
+    """Лента подписок по ключу (pub_date, id).
+
+    Разложенные посты читаются одним диапазоном индекса
+    (user, -pub_date, -post) по TimelineEntry, посты авторов без
+    раскладки - по индексу (author, -pub_date, -id). Обе выборки берут
+    по per_page + 1 записей от курсора и сливаются по ключу.
+    """
+
+    def __init__(self, user, per_page, posts=None):
+        self.user = user
+        self.posts = Post.objects.all() if posts is None else posts
+        super().__init__(timeline_posts(user), per_page)
+
+    def _direction(self, cursor):
+        values, reverse = decode_cursor(cursor) if cursor else (None, False)
+        if values is None or self._parse_values(values) is None:
+            return False
+        return reverse
+
+    def get_page(self, cursor=None):
+        entries = KeysetPaginator(
+            TimelineEntry.objects.filter(user=self.user), self.per_page,
+            ordering=('-pub_date', '-post_id')).get_page(cursor)
+        pages = [entries]
+        pull_ids = list(_pull_authors(self.user).values_list('user_id',
+                                                             flat=True))
+        if pull_ids:
+            pages.append(KeysetPaginator(
+                self.posts.filter(author_id__in=pull_ids),
+                self.per_page).get_page(cursor))
+
+        found = self.posts.in_bulk([entry.post_id for entry in entries])
+        merged = {post.pk: post for post in found.values()}
+        for page in pages[1:]:
+            merged.update((post.pk, post) for post in page)
+        items = sorted(merged.values(),
+                       key=lambda post: (post.pub_date, post.pk),
+                       reverse=True)
+        more = len(items) > self.per_page
+
+        if self._direction(cursor):
+            return KeysetPage(
+                items[-self.per_page:], self, True,
+                more or any(page.has_previous() for page in pages))
+        return KeysetPage(
+            items[:self.per_page], self,
+            more or any(page.has_next() for page in pages),
+            any(page.has_previous() for page in pages))
@@ -0,0 +1,64 @@
+from functools import wraps
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+
+class OversizedUploadedFile(UploadedFile):
+    """Пустая замена файла, превысившего POST_IMAGE_MAX_UPLOAD_SIZE."""
+
+    oversized = True
+
+    def __init__(self, name, content_type, size):
+        super().__init__(BytesIO(), name, content_type, size)
+
+
+class ImageSizeLimitUploadHandler(FileUploadHandler):
+    """Обрывает прием, как только файл превысил лимит.
+
+    Остаток тела запроса не читается (StopUpload с connection_reset),
+    поля формы после файла теряются. Вместо файла limit_image_upload
+    кладет в request.FILES OversizedUploadedFile, который отклоняет
+    форма.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.oversized = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+            self.oversized = OversizedUploadedFile(
+                self.file_name, self.content_type, self.received)
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+# лимит только для форм постов: обработчик ставится до разбора тела,
+# поэтому проверка CSRF переносится внутрь, как в документации Django
+def limit_image_upload(view):
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        handler = ImageSizeLimitUploadHandler(request)
+        request.upload_handlers.insert(0, handler)
+        if request.method == 'POST':
+            # разбор тела; после него известно, был ли файл оборван
+            files = request.FILES
+            if handler.oversized is not None:
+                files[handler.field_name] = handler.oversized
+        return protected(request, *args, **kwargs)
+    return wrapper
@@ -7,12 +7,23 @@ urlpatterns = [
     path('group/<slug:slug>', views.group_post, name='group'),
     path('new/', views.new_post, name='new_post'),
     path("follow/", views.follow_index, name="follow_index"),
+    path('search/', views.search_view, name='search'),
+    path('events/', views.event_stream, name='events'),
+    path('fragments/index/', views.index_fragment, name='index_fragment'),
+    path('fragments/group/<slug:slug>/', views.group_fragment,
+         name='group_fragment'),
+    path('fragments/follow/', views.follow_fragment,
+         name='follow_fragment'),
+    path('fragments/profile/<str:username>/', views.profile_fragment,
+         name='profile_fragment'),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path('<str:username>/<int:post_id>/edit/', views.post_edit,
          name='post_edit'),
     path("<username>/<int:post_id>/comment",
          views.add_comment, name="add_comment"),
+    path('<str:username>/<int:post_id>/comments/', views.comments_fragment,
+         name='comments_fragment'),
 
     path("<str:username>/follow/", views.profile_follow,
          name="profile_follow"),
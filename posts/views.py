@@ -1,42 +1,162 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
+from yatube.pagecache import add_surrogate_keys
+
+from . import feeds, fragments, search, social, thumbnails, timeline
+from .conditional import (conditional, follow_querysets, group_querysets,
+                          index_querysets, post_querysets,
+                          profile_querysets)
+from .counts import CountedPaginator
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .paginator import KeysetPaginator
+from .uploadhandlers import limit_image_upload
 
 
-# функция педженатора
-def post_paginator(request, post_list):
-    paginator = Paginator(post_list, settings.POSTS_IN_PAGE)
+# функция педженатора. По умолчанию лента листается курсором ?cursor=,
+# старые ссылки вида ?page=N обслуживаются Paginator со счетчиком count
+# или оценкой числа записей вместо COUNT(*)
+def post_paginator(request, post_list, count=None, keyset=None):
     page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    if page_number is not None:
+        paginator = CountedPaginator(post_list, settings.POSTS_IN_PAGE,
+                                     count=count)
+        page = paginator.get_page(page_number)
+        return page, paginator
+
+    paginator = keyset or KeysetPaginator(post_list, settings.POSTS_IN_PAGE)
+    page = paginator.get_page(request.GET.get('cursor'))
     return page, paginator
 
 
+# суррогатные ключи страницы со списком постов: ключи самой страницы,
+# постов, авторов и групп, чьи имена и названия показаны в карточках
+def add_feed_keys(response, page, *keys):
+    keys = list(keys)
+    for post in page:
+        keys.append(f'post:{post.pk}')
+        keys.append(f'by-author:{post.author_id}')
+        if post.group_id is not None:
+            keys.append(f'in-group:{post.group_id}')
+    return add_surrogate_keys(response, *keys)
+
+
+# подсказки preload для картинок карточек, которые браузер может начать
+# грузить заранее. Если есть WebP, подсказывается он: браузер без WebP
+# пропустит подсказку по type, а не скачает картинку дважды
+def preload_links(page):
+    links = []
+    for post in page:
+        picture = thumbnails.picture(post)
+        if picture is None:
+            continue
+        if picture['webp_srcset']:
+            links.append(f'<{picture["webp_src"]}>; rel="preload"; '
+                         f'as="image"; type="image/webp"; '
+                         f'imagesrcset="{picture["webp_srcset"]}"; '
+                         f'imagesizes="{picture["sizes"]}"')
+        else:
+            links.append(f'<{picture["src"]}>; rel="preload"; as="image"; '
+                         f'imagesrcset="{picture["jpeg_srcset"]}"; '
+                         f'imagesizes="{picture["sizes"]}"')
+    return links
+
+
+def add_links(response, links):
+    if links:
+        response['Link'] = ', '.join(links)
+    return response
+
+
+# подсказки для заголовка Link фрагмента: следующая порция ленты
+# и картинки карточек
+def feed_links(request, page, fragment_url):
+    links = []
+    if page.has_next():
+        query = request.GET.copy()
+        query.pop('page', None)
+        query['cursor'] = page.next_cursor
+        links.append(f'<{fragment_url}?{query.urlencode()}>; rel="next"')
+    return links + preload_links(page)
+
+
+# следующая порция ленты для бесконечной прокрутки: только карточки
+# постов, без base.html, меню и паджинатора
+def feed_fragment(request, post_list, fragment_url, *keys, keyset=None):
+    paginator = keyset or KeysetPaginator(post_list, settings.POSTS_IN_PAGE)
+    page = paginator.get_page(request.GET.get('cursor'))
+    response = HttpResponse(
+        fragments.render_post_items(list(page), request.user))
+    add_links(response, feed_links(request, page, fragment_url))
+    return add_feed_keys(response, page, *keys)
+
+
+@conditional(index_querysets)
 def index(request):
-    post_list = Post.objects.select_related(
-        "group", "author",).prefetch_related("comments")
+    post_list = feeds.index_posts()
     page, paginator = post_paginator(request, post_list)
-    return render(request,
-                  'index.html', {'page': page, 'paginator': paginator})
+    response = render(request, 'index.html', {
+        'page': page,
+        'paginator': paginator,
+        'fragment_url': reverse('index_fragment'),
+    })
+    add_links(response, preload_links(page))
+    return add_feed_keys(response, page, 'index')
+
+
+@conditional(index_querysets)
+def index_fragment(request):
+    return feed_fragment(request, feeds.index_posts(),
+                         reverse('index_fragment'), 'index')
 
 
 # страница с списком всех групп
+@conditional(group_querysets)
 def group_post(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page, paginator = post_paginator(request, post_list)
+    post_list = feeds.group_posts(group)
+    page, paginator = post_paginator(request, post_list, group.posts_count)
+
+    response = render(request, 'posts/group.html',
+                      {'group': group,
+                       'page': page,
+                       'paginator': paginator,
+                       'fragment_url': reverse('group_fragment',
+                                               args=[slug])})
+    add_links(response, preload_links(page))
+    return add_feed_keys(response, page, f'group:{group.pk}')
 
-    return render(request, 'posts/group.html',
-                  {'group': group,
-                   'page': page,
-                   'paginator': paginator})
+
+@conditional(group_querysets)
+def group_fragment(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_fragment(request, feeds.group_posts(group),
+                         reverse('group_fragment', args=[slug]),
+                         f'group:{group.pk}')
+
+
+# поиск по постам, комментариям и группам
+def search_view(request):
+    query = request.GET.get('q', '').strip()
+    page = groups = None
+    if query:
+        paginator = search.SearchPaginator(query, settings.POSTS_IN_PAGE)
+        page = paginator.get_page(request.GET.get('cursor'))
+        groups = search.search_groups(query)
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page': page,
+        'groups': groups,
+    })
 
 
 # страница для создания новых постов
+@limit_image_upload
 @login_required
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -46,25 +166,62 @@ def new_post(request):
     post = form.save(commit=False)
     post.author = request.user
     form.save()
+    thumbnails.schedule(post)
     return redirect('index')
 
 
-# страница индивидуальных постов
-def post_view(request, username, post_id):
-    form = CommentForm(request.POST or None)
-    author = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, pk=post_id, author=author)
-    comments = post.comments.select_related('author')
-    return render(request, 'posts/post.html', {
+# первая страница комментариев к посту; ?comments= - курсор для
+# перехода без JavaScript
+def comments_page(request, post, cursor_param, per_page):
+    paginator = KeysetPaginator(feeds.post_comments(post), per_page,
+                                ordering=('-created', '-id'))
+    return paginator.get_page(request.GET.get(cursor_param))
+
+
+def render_post_page(request, post, form):
+    response = render(request, 'posts/post.html', {
         'post': post,
-        'author': author,
+        'author': post.author,
         'form': form,
-        'comments': comments,
+        'comments': comments_page(request, post, 'comments',
+                                  settings.COMMENTS_IN_PAGE),
 
     })
+    return add_feed_keys(response, [post], f'author:{post.author_id}')
+
+
+def get_post(username, post_id):
+    return get_object_or_404(Post.objects.select_related('author', 'group'),
+                             pk=post_id, author__username=username)
+
+
+# страница индивидуальных постов
+@conditional(post_querysets)
+def post_view(request, username, post_id):
+    return render_post_page(request, get_post(username, post_id),
+                            CommentForm())
+
+
+# следующая порция комментариев в виде HTML-фрагмента
+def comments_fragment(request, username, post_id):
+    post = get_post(username, post_id)
+    response = render(request, 'posts/comment_items.html', {
+        'post': post,
+        'comments': comments_page(request, post, 'cursor',
+                                  settings.COMMENTS_BATCH),
+    })
+    return add_surrogate_keys(response, f'post:{post.pk}')
+
+
+# поток событий обслуживает yatube.asgi до Django. Сюда запрос доходит
+# только под WSGI, где поток держал бы воркер: 204 велит EventSource
+# больше не переподключаться
+def event_stream(request):
+    return HttpResponse(status=204)
 
 
 # страница редактирования постов. Доступ только для авторизованных.
+@limit_image_upload
 @login_required()
 def post_edit(request, username, post_id):
     # проверка на владельца поста.
@@ -78,7 +235,11 @@ def post_edit(request, username, post_id):
     form = PostForm(request.POST or None, files=request.FILES or None,
                     instance=post)
     if request.method == 'POST' and form.is_valid():
+        if 'image' in form.changed_data:
+            post.image_variants = ''
         post.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect(reverse('post', kwargs={'username': username,
                                                 'post_id': post_id}))
 
@@ -91,15 +252,17 @@ def post_edit(request, username, post_id):
 # комментарии к посту
 @login_required()
 def add_comment(request, username, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_post(username, post_id)
     form = CommentForm(request.POST or None)
     if request.GET or not form.is_valid():
-        return post_view(request, username, post_id)
+        return render_post_page(request, post, form)
 
     comment = form.save(commit=False)
     comment.author = request.user
     comment.post = post
-    form.save()
+    # комментарий и счетчик comments_count сохраняются вместе
+    with transaction.atomic():
+        form.save()
 
     return redirect(reverse('post', kwargs={'username': username,
                                             'post_id': post_id}))
@@ -107,18 +270,27 @@ def add_comment(request, username, post_id):
 
 # страница подписанных авторов
 @login_required
+@conditional(follow_querysets)
 def follow_index(request):
-    follow = Follow.objects.filter(user__username=request.user
-                                   ).select_related('author'
-                                                    ).values_list('author_id')
-
-    post_list = Post.objects.filter(author__in=follow)
+    post_list = feeds.follow_posts(request.user)
 
-    page, paginator = post_paginator(request, post_list)
-    return render(request, "follow.html", {
+    page, paginator = post_paginator(
+        request, post_list,
+        keyset=feeds.follow_paginator(request.user, settings.POSTS_IN_PAGE))
+    response = render(request, "follow.html", {
         "page": page,
         "paginator": paginator,
+        "fragment_url": reverse("follow_fragment"),
     })
+    return add_links(response, preload_links(page))
+
+
+@login_required
+@conditional(follow_querysets)
+def follow_fragment(request):
+    return feed_fragment(
+        request, feeds.follow_posts(request.user), reverse('follow_fragment'),
+        keyset=feeds.follow_paginator(request.user, settings.POSTS_IN_PAGE))
 
 
 # функция подписки на пользователя
@@ -127,7 +299,10 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     # если пользователь не автор и запись отсутствует, создадим ее
     if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        _, created = Follow.objects.get_or_create(user=request.user,
+                                                  author=author)
+        if created:
+            timeline.backfill(request.user, author)
 
     return redirect('profile', username=username)
 
@@ -135,36 +310,44 @@ def profile_follow(request, username):
 # отписывание от пользователя
 @login_required
 def profile_unfollow(request, username):
-    follower = Follow.objects.filter(
-        user__username=request.user,
-        author__username=username).select_related('follower')
-    if follower.exists():
-        follower.delete()
+    author = get_object_or_404(User, username=username)
+    social.unfollow_many(request.user, [author])
     return redirect('profile', username=username)
 
 
 # страница профиля пользователя с списком постов
+@conditional(profile_querysets)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    following = False
-    if request.user.is_authenticated and \
-            Follow.objects.filter(user=request.user, author=author).exists():
-        following = True
-        # лист подписчиков
-    followers_count = Follow.objects.filter(
-        author__username=username).select_related('follower').count()
-    followers_list = Follow.objects.filter(author=author)
-    post_list = author.posts.all()
-    page, paginator = post_paginator(request, post_list)
-
-    return render(request, 'posts/profile.html', {
+    stats = social.get_stats(author)
+    following = social.is_following(request.user, author)
+    # лист подписчиков
+    followers_list = Follow.objects.filter(author=author).select_related(
+        'user')[:settings.PROFILE_FOLLOWERS_IN_CARD]
+    post_list = feeds.author_posts(author)
+    page, paginator = post_paginator(request, post_list, stats.posts_count)
+
+    response = render(request, 'posts/profile.html', {
         'page': page,
         'paginator': paginator,
         'profile': author,
         'following': following,
         'followers_list': followers_list,
-        'followers_count': followers_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
+        'posts_count': stats.posts_count,
+        'fragment_url': reverse('profile_fragment', args=[username]),
     })
+    add_links(response, preload_links(page))
+    return add_feed_keys(response, page, f'author:{author.pk}')
+
+
+@conditional(profile_querysets)
+def profile_fragment(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_fragment(request, feeds.author_posts(author),
+                         reverse('profile_fragment', args=[username]),
+                         f'author:{author.pk}')
 
 
 # 404
@@ -0,0 +1,47 @@
+"""
+ASGI config for yatube project.
+
+Django 2.2 has no ASGI handler, so the project is served through asgiref's
+WSGI adapter. The event stream is answered here, before Django: an idle
+subscriber is a coroutine waiting on its queue instead of a busy worker
+thread. Pages subscribe to the stream only when YATUBE_EVENTS is set, which
+this module does before the settings are loaded. Run it with any ASGI
+server, e.g. ``uvicorn yatube.asgi:application``, as a single process:
+posts.events keeps subscriptions in memory.
+"""
+
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+os.environ.setdefault('YATUBE_EVENTS', '1')
+
+django_application = WsgiToAsgi(get_wsgi_application())
+
+from django.urls import reverse  # noqa: E402
+
+from posts import events  # noqa: E402
+
+EVENTS_PATH = reverse('events')
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+    elif (scope['type'] == 'http' and scope['path'] == EVENTS_PATH
+            and scope['method'] in ('GET', 'HEAD')):
+        await events.asgi_stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,367 @@
+import hashlib
+import math
+import os
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Двухуровневый кеш: небольшой LRU в памяти процесса перед общим для всех
+# воркеров бэкендом (OPTIONS['SHARED'] - алиас из CACHES). Локальная копия
+# живет не дольше LOCAL_TIMEOUT секунд, так что сброс в одном воркере
+# доходит до остальных с этой задержкой.
+#
+# Записи можно помечать тегами (tags=[...]) и сбрасывать пачкой через
+# invalidate_tags(): у каждого тега в общем кеше хранится версия, запись
+# с устаревшей версией тега считается отсутствующей. Версии нужно
+# запоминать до чтения данных, из которых строится значение: сброс,
+# пришедший во время отрисовки, иначе потеряется. Для этого вместо списка
+# тегов передается tag_versions(), снятый заранее, или
+# tag_versions(..., since=момент начала чтения).
+#
+# get_or_set() защищен от лавины пересчетов: пересчитывает значение один
+# воркер, взявший блокировку, остальные отдают старое значение или ждут.
+# Блокировка для файлового общего кеша - файл, созданный с O_EXCL (add()
+# FileBasedCache не атомарен), для остальных бэкендов - их add().
+# Незадолго до истечения срока значение пересчитывается заранее
+# с вероятностью, растущей к концу срока (XFetch).
+
+TAG_PREFIX = 'tag:'
+LOCK_SUFFIX = ':lock'
+# версия тега, измененного после начала чтения: запись с ней устарела
+OUTDATED = 0
+
+# экземпляры бэкенда создаются на каждый поток, а локальный уровень
+# общий для всего процесса
+_local_stores = {}
+_local_stores_lock = threading.Lock()
+
+
+def _local_store(name):
+    with _local_stores_lock:
+        if name not in _local_stores:
+            _local_stores[name] = (OrderedDict(), threading.Lock())
+        return _local_stores[name]
+
+
+class TieredCache(BaseCache):
+    """Локальный LRU перед общим кешем с тегами и защитой от лавины."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._local_max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self._lock_timeout = options.get('LOCK_TIMEOUT', 10)
+        self._early_refresh = options.get('EARLY_REFRESH', 1.0)
+        self._local, self._lock = _local_store(
+            location or self._shared_alias)
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _timeout_seconds(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return timeout
+
+    # локальный уровень: key -> (срок, теги, запись в pickle)
+    def _local_get(self, key):
+        with self._lock:
+            item = self._local.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+        return pickle.loads(item[2])
+
+    def _local_set(self, key, entry):
+        expires = time.time() + self._local_timeout
+        if entry['expires'] is not None:
+            expires = min(expires, entry['expires'])
+        item = (expires, set(entry['tags']), pickle.dumps(entry))
+        with self._lock:
+            self._local[key] = item
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    # версии тегов; отсутствующий тег получает версию initial или новую
+    def _tag_versions(self, tags, create=False, initial=None):
+        if not tags:
+            return {}
+        tag_keys = {TAG_PREFIX + tag: tag for tag in tags}
+        found = self.shared.get_many(list(tag_keys))
+        if create:
+            for tag_key in set(tag_keys) - set(found):
+                self.shared.add(tag_key, initial or time.time_ns(), None)
+            if len(found) < len(tag_keys):
+                found = self.shared.get_many(list(tag_keys))
+        return {tag_keys[tag_key]: version
+                for tag_key, version in found.items()}
+
+    def tag_versions(self, *tags, since=None):
+        """Снимок версий тегов для tags= в set(), add() и get_or_set().
+
+        since - time.time_ns() начала чтения данных: теги, сброшенные
+        позже, получают версию OUTDATED, и запись с ними не сохраняется.
+        Запись по снимку не сохраняется и тогда, когда тег сбросили уже
+        после снимка.
+        """
+        versions = self._tag_versions(tags, create=True, initial=since)
+        if since is not None:
+            versions = {tag: version if version <= since else OUTDATED
+                        for tag, version in versions.items()}
+        return versions
+
+    def _is_fresh(self, entry):
+        if entry['expires'] is not None and entry['expires'] <= time.time():
+            return False
+        if entry['tags']:
+            return self._tag_versions(entry['tags']) == entry['tags']
+        return True
+
+    # tags - имена тегов или снимок tag_versions(). Если тег сбросили
+    # после снимка, значение устарело еще до записи: возвращается None
+    def _make_entry(self, value, timeout, tags, delta=0.0, current=None):
+        seconds = self._timeout_seconds(timeout)
+        if isinstance(tags, dict):
+            if current is None:
+                current = self._tag_versions(tags)
+            if (OUTDATED in tags.values()
+                    or {tag: current.get(tag) for tag in tags} != tags):
+                return None
+        else:
+            tags = self._tag_versions(tags or (), create=True)
+        return {
+            'value': value,
+            'expires': None if seconds is None else time.time() + seconds,
+            'tags': tags,
+            'delta': delta,
+        }
+
+    def _get_entry(self, key):
+        entry = self._local_get(key)
+        if entry is not None:
+            return entry
+        entry = self.shared.get(key)
+        if entry is None:
+            return None
+        if not self._is_fresh(entry):
+            return None
+        self._local_set(key, entry)
+        return entry
+
+    def _set_entry(self, key, entry, timeout):
+        self.shared.set(key, entry, self._timeout_seconds(timeout))
+        self._local_set(key, entry)
+
+    def _lock_path(self, lock_key):
+        directory = getattr(self.shared, '_dir', None)
+        if directory is None:
+            return None
+        digest = hashlib.md5(lock_key.encode()).hexdigest()
+        return os.path.join(directory, digest + '.lock')
+
+    # атомарная блокировка без ожидания; брошенная упавшим воркером
+    # блокировка снимается через LOCK_TIMEOUT
+    def _acquire(self, lock_key):
+        path = self._lock_path(lock_key)
+        if path is None:
+            return self.shared.add(lock_key, 1, self._lock_timeout)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                pass
+            try:
+                taken = os.path.getmtime(path)
+            except FileNotFoundError:
+                continue
+            if taken + self._lock_timeout > time.time():
+                return False
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return False
+
+    def _release(self, lock_key):
+        path = self._lock_path(lock_key)
+        if path is None:
+            self.shared.delete(lock_key)
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+            tags=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        lock_key = key + LOCK_SUFFIX
+        if not self._acquire(lock_key):
+            return False
+        try:
+            if self._get_entry(key) is not None:
+                return False
+            entry = self._make_entry(value, timeout, tags)
+            if entry is None:
+                return False
+            self._set_entry(key, entry, timeout)
+            return True
+        finally:
+            self._release(lock_key)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        entry = self._get_entry(key)
+        return default if entry is None else entry['value']
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None,
+            tags=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        entry = self._make_entry(value, timeout, tags)
+        if entry is not None:
+            self._set_entry(key, entry, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self._local_delete(key)
+        entry = self.shared.get(key)
+        if entry is None:
+            return False
+        seconds = self._timeout_seconds(timeout)
+        entry['expires'] = None if seconds is None else time.time() + seconds
+        self.shared.set(key, entry, seconds)
+        return True
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._local_delete(key)
+        self.shared.delete(key)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        result = {}
+        missing = []
+        for made_key, key in made.items():
+            entry = self._local_get(made_key)
+            if entry is None:
+                missing.append(made_key)
+            else:
+                result[key] = entry['value']
+        if missing:
+            for made_key, entry in self.shared.get_many(missing).items():
+                if self._is_fresh(entry):
+                    self._local_set(made_key, entry)
+                    result[made[made_key]] = entry['value']
+        return result
+
+    # key_tags - теги отдельных ключей {key: теги или снимок}, для
+    # остальных ключей действуют tags; версии снимков сверяются одним
+    # запросом
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None,
+                 tags=None, key_tags=None):
+        key_tags = key_tags or {}
+        snapshots = [item for item in (tags, *key_tags.values())
+                     if isinstance(item, dict)]
+        current = self._tag_versions(
+            {tag for snapshot in snapshots for tag in snapshot})
+        entries = {}
+        for key, value in data.items():
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            entry = self._make_entry(value, timeout, key_tags.get(key, tags),
+                                     current=current)
+            if entry is not None:
+                entries[made_key] = entry
+        self.shared.set_many(entries, self._timeout_seconds(timeout))
+        for made_key, entry in entries.items():
+            self._local_set(made_key, entry)
+        return []
+
+    def delete_many(self, keys, version=None):
+        made_keys = [self.make_key(key, version=version) for key in keys]
+        self._local_delete(*made_keys)
+        self.shared.delete_many(made_keys)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def invalidate_tags(self, *tags):
+        if not tags:
+            return
+        self.shared.set_many(
+            {TAG_PREFIX + tag: time.time_ns() for tag in tags}, None)
+        tags = set(tags)
+        with self._lock:
+            stale = [key for key, item in self._local.items()
+                     if item[1] & tags]
+            for key in stale:
+                del self._local[key]
+
+    def _should_refresh(self, entry):
+        if entry['expires'] is None or not entry['delta']:
+            return False
+        jitter = -entry['delta'] * self._early_refresh * math.log(
+            1 - random.random())
+        return time.time() + jitter >= entry['expires']
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT,
+                   version=None, tags=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        entry = self._get_entry(made_key)
+        if entry is not None and not self._should_refresh(entry):
+            return entry['value']
+
+        lock_key = made_key + LOCK_SUFFIX
+        deadline = time.time() + self._lock_timeout
+        locked = self._acquire(lock_key)
+        while not locked:
+            # пересчитывает другой воркер: отдаем то, что есть
+            if entry is not None:
+                return entry['value']
+            if time.time() >= deadline:
+                break
+            time.sleep(0.05)
+            entry = self._get_entry(made_key)
+            if entry is not None:
+                return entry['value']
+            locked = self._acquire(lock_key)
+        try:
+            # версии тегов снимаются до вычисления значения
+            if not isinstance(tags, dict):
+                tags = self._tag_versions(tags or (), create=True)
+            started = time.time()
+            value = default() if callable(default) else default
+            entry = self._make_entry(value, timeout, tags,
+                                     time.time() - started)
+            if entry is not None:
+                self._set_entry(made_key, entry, timeout)
+        finally:
+            if locked:
+                self._release(lock_key)
+        return value
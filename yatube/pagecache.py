@@ -0,0 +1,93 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+# Кеш целых страниц для анонимных читателей. Middleware стоит до сессий:
+# запрос без куки сессии и с ответом в кеше не доходит ни до сессии, ни
+# до вью. Кешируются только ответы, помеченные суррогатными ключами
+# (заголовок Surrogate-Key, его же понимают CDN). Ключи страницы служат
+# тегами записи в кеше, purge() сбрасывает все страницы с этими ключами.
+# Страница, во время отрисовки которой пришел сброс, не сохраняется.
+# FULL_PAGE_CACHE_TIMEOUT = 0 отключает кеш.
+
+HEADER = 'Surrogate-Key'
+TAG_PREFIX = 'page:'
+
+
+def add_surrogate_keys(response, *keys):
+    current = response.get(HEADER, '').split()
+    for key in keys:
+        if key not in current:
+            current.append(key)
+    response[HEADER] = ' '.join(current)
+    return response
+
+
+def surrogate_keys(*keys):
+    """Декоратор вью с постоянными суррогатными ключами."""
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = view_func(request, *args, **kwargs)
+            return add_surrogate_keys(response, *keys)
+        return wrapper
+    return decorator
+
+
+def purge(*keys):
+    cache.invalidate_tags(*[TAG_PREFIX + key for key in keys])
+
+
+def _cache_key(request):
+    url = request.build_absolute_uri()
+    return 'page:' + hashlib.md5(url.encode()).hexdigest()
+
+
+class FullPageCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def is_cacheable_request(self, request):
+        return (settings.FULL_PAGE_CACHE_TIMEOUT
+                and request.method in ('GET', 'HEAD')
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES)
+
+    @staticmethod
+    def is_cacheable_response(response):
+        return (response.status_code == 200
+                and HEADER in response
+                and not response.streaming
+                and not response.cookies)
+
+    def __call__(self, request):
+        if not self.is_cacheable_request(request):
+            return self.get_response(request)
+
+        key = _cache_key(request)
+        response = cache.get(key)
+        if response is not None:
+            response['X-Page-Cache'] = 'hit'
+            return get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified', '')),
+                response=response,
+            )
+
+        started = time.time_ns()
+        response = self.get_response(request)
+        if self.is_cacheable_response(response):
+            tags = cache.tag_versions(
+                *[TAG_PREFIX + key for key in response[HEADER].split()],
+                since=started)
+            cache.set(key, response, settings.FULL_PAGE_CACHE_TIMEOUT,
+                      tags=tags)
+            response['X-Page-Cache'] = 'miss'
+        return response
@@ -0,0 +1,96 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.utils import ConnectionDoesNotExist
+
+# Маршрутизация чтения на реплики. Middleware помечает запросы к
+# страницам из REPLICA_READ_VIEWS, и на время такого запроса роутер
+# отправляет чтение на одну из REPLICA_DATABASES. После записи (POST или
+# вью из REPLICA_WRITE_VIEWS) пользователь на REPLICA_PIN_SECONDS
+# закрепляется за основной базой, чтобы не увидеть отстающую реплику.
+# Если реплика недоступна, чтение идет в основную базу.
+
+PIN_COOKIE = 'db_primary_until'
+
+_state = threading.local()
+
+
+def current_replica():
+    return getattr(_state, 'replica', None)
+
+
+def _usable(alias):
+    try:
+        connections[alias].ensure_connection()
+    except (ConnectionDoesNotExist, DatabaseError):
+        return False
+    return True
+
+
+def choose_replica():
+    aliases = list(settings.REPLICA_DATABASES)
+    random.shuffle(aliases)
+    for alias in aliases:
+        if _usable(alias):
+            return alias
+    return None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in settings.REPLICA_EXCLUDED_APPS:
+            return None
+        return current_replica()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.replica = None
+        if self.is_write(request):
+            pin_until = time.time() + settings.REPLICA_PIN_SECONDS
+            response.set_cookie(PIN_COOKIE, str(pin_until),
+                                max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD')
+                and self.url_name(request) in settings.REPLICA_READ_VIEWS
+                and not self.is_pinned(request)):
+            _state.replica = choose_replica()
+
+    @staticmethod
+    def url_name(request):
+        match = getattr(request, 'resolver_match', None)
+        return match.url_name if match else None
+
+    def is_write(self, request):
+        return (request.method not in ('GET', 'HEAD', 'OPTIONS')
+                or self.url_name(request) in settings.REPLICA_WRITE_VIEWS)
+
+    @staticmethod
+    def is_pinned(request):
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -26,15 +27,19 @@ INSTALLED_APPS = [
 
     'posts',
     'about',
+    'api',
 
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'yatube.pagecache.FullPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yatube.replicas.ReplicaRoutingMiddleware',
+    'yatube.template_profiling.TemplateProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     "debug_toolbar.middleware.DebugToolbarMiddleware",
@@ -46,17 +51,27 @@ INTERNAL_IPS = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# вне отладки шаблоны компилируются один раз и хранятся в памяти процесса
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'posts.context_processors.live_updates',
             ],
         },
     },
@@ -71,6 +86,32 @@ DATABASES = {
     }
 }
 
+# реплики только для чтения. Локально роль реплики может играть второй
+# файл SQLite: YATUBE_REPLICA_DB=/path/to/replica.sqlite3. Без него алиас
+# replica смотрит в основную базу и чтение на него не идет; в тестах он
+# зеркало default, на нем проверяется маршрутизация
+REPLICA_DATABASES = []
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': os.environ.get('YATUBE_REPLICA_DB', DATABASES['default']['NAME']),
+    'TEST': {'MIRROR': 'default'},
+}
+if os.environ.get('YATUBE_REPLICA_DB'):
+    REPLICA_DATABASES.append('replica')
+
+DATABASE_ROUTERS = ['yatube.replicas.ReplicaRouter']
+# страницы, которые читают с реплик, и вью, после которых пользователь
+# на REPLICA_PIN_SECONDS (допустимое отставание реплики) читает из основной
+REPLICA_READ_VIEWS = ['index', 'group', 'profile', 'post', 'follow_index',
+                      'comments_fragment', 'post_list', 'post_detail',
+                      'post_comments', 'group_detail', 'group_posts',
+                      'user_list', 'user_detail', 'user_posts',
+                      'follow_posts', 'index_fragment', 'group_fragment',
+                      'profile_fragment', 'follow_fragment']
+REPLICA_WRITE_VIEWS = ['profile_follow', 'profile_unfollow']
+REPLICA_PIN_SECONDS = 5
+REPLICA_EXCLUDED_APPS = ['sessions']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -111,10 +152,93 @@ LOGIN_REDIRECT_URL = 'index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# двухуровневый кеш: LRU в памяти процесса перед общим для всех воркеров
+# файловым кешем. TIMEOUT задает срок по умолчанию, LOCAL_TIMEOUT - сколько
+# живет локальная копия (на столько может отстать сброс в других воркерах)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'yatube.cache.TieredCache',
+        'LOCATION': 'default',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_TIMEOUT': 5,
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCK_TIMEOUT': 10,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_DIR',
+                                   os.path.join(BASE_DIR, 'cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
 }
+TEST_RUNNER = 'yatube.test_runner.CacheClearingRunner'
 # paginator settings
 POSTS_IN_PAGE = 10
+# комментарии: сколько показывать на странице поста и сколько
+# подгружать за раз кнопкой "Показать еще"
+COMMENTS_IN_PAGE = 20
+COMMENTS_BATCH = 50
+# синхронизация клиентов: сколько секунд до токена перечитывать, сколько
+# хранить следы удалений и сколько записей каждого вида отдавать за раз
+SYNC_OVERLAP = 5
+SYNC_TOMBSTONE_TTL = timedelta(days=30)
+SYNC_MAX_ITEMS = 100
+# JSON API: наибольший размер страницы и число ids в одном запросе
+API_MAX_PAGE_SIZE = 100
+API_MAX_IDS = 100
+# сколько номеров страниц показывать с каждой стороны от текущей
+PAGINATOR_WINDOW = 2
+# точный COUNT(*) только для лент меньше порога, выше - оценка
+# планировщика PostgreSQL; без нее точное число кешируется
+EXACT_COUNT_THRESHOLD = 10000
+POSTS_COUNT_CACHE_TIMEOUT = 10 * 60
+
+# лента подписок: авторы с большим числом подписчиков
+# не раскладываются по лентам при публикации
+TIMELINE_FANOUT_MAX_FOLLOWERS = 1000
+TIMELINE_BATCH_SIZE = 500
+
+# кеш карточек постов. Версию нужно поднять при изменении post_item.html
+POST_FRAGMENT_VERSION = 3
+POST_FRAGMENT_TIMEOUT = 60 * 60
+# кеш страниц ленты, сбрасывается при изменении постов
+FEED_CACHE_TIMEOUT = 10 * 60
+# кеш целых страниц для анонимов; при отладке выключен
+FULL_PAGE_CACHE_TIMEOUT = 0 if DEBUG else 10 * 60
+
+# события для открытых страниц (SSE) работают только под yatube.asgi,
+# он включает их через YATUBE_EVENTS; под WSGI страницы не подписываются.
+# Сколько последних событий помнить для переподключений, очередь и число
+# каналов одного клиента, период пинга и пауза до переподключения (мс)
+EVENTS_ENABLED = bool(os.environ.get('YATUBE_EVENTS'))
+EVENTS_BACKLOG = 100
+EVENTS_QUEUE_SIZE = 100
+EVENTS_MAX_CHANNELS = 10
+EVENTS_HEARTBEAT = 15
+EVENTS_RETRY = 3000
+
+# профилирование шаблонов: время и число запросов на каждый шаблон
+# и {% include %} пишутся в лог yatube.templates
+TEMPLATE_PROFILING = bool(os.environ.get('YATUBE_TEMPLATE_PROFILING'))
+
+# граф подписок: время жизни кеша и число подписчиков в карточке профиля
+SOCIAL_GRAPH_TIMEOUT = 60 * 10
+PROFILE_FOLLOWERS_IN_CARD = 20
+
+# число потоков, готовящих миниатюры картинок; 0 - готовить сразу
+THUMBNAIL_WORKERS = 2
+# ширины вариантов картинки поста и атрибут sizes для <img>
+POST_IMAGE_WIDTHS = (320, 640, 960, 1920)
+POST_IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+POST_IMAGE_QUALITY = 82
+
+# ограничения загружаемых картинок: размер файла (проверяется при
+# приеме в формах постов, см. posts.uploadhandlers), число пикселей
+# в заголовке и наибольшая сторона сохраняемого оригинала
+POST_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+POST_IMAGE_MAX_SIDE = 1920
@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger('yatube.templates')
+
+# Профилирование отрисовки шаблонов. Template._render оборачивается один
+# раз на процесс и только при TEMPLATE_PROFILING; uninstall() возвращает
+# исходный метод. Пока идет запрос, для каждого шаблона (в том числе
+# подключенного через {% include %} или отрисованного render_to_string)
+# считаются число отрисовок, полное время и число SQL-запросов ко всем
+# базам, включая реплики, сделанных во время отрисовки. Итог по запросу
+# пишется в лог yatube.templates, шаблоны отсортированы по времени.
+
+_state = threading.local()
+_install_lock = threading.Lock()
+_original_render = None
+
+
+class RenderProfile:
+    """Статистика отрисовки шаблонов за один запрос."""
+
+    def __init__(self):
+        self.stats = defaultdict(lambda: {'calls': 0, 'time': 0.0,
+                                          'queries': 0})
+        self.queries = 0
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def record(self, name, elapsed, queries):
+        stats = self.stats[name]
+        stats['calls'] += 1
+        stats['time'] += elapsed
+        stats['queries'] += queries
+
+    def report(self, title):
+        lines = [title]
+        for name, stats in sorted(self.stats.items(),
+                                  key=lambda item: -item[1]['time']):
+            lines.append('  {} x{}: {:.1f} ms, {} queries'.format(
+                name, stats['calls'], stats['time'] * 1000,
+                stats['queries']))
+        return '\n'.join(lines)
+
+
+def _profiled_render(self, context):
+    profile = getattr(_state, 'profile', None)
+    if profile is None:
+        return _original_render(self, context)
+    queries = profile.queries
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        name = self.origin.template_name if self.origin else None
+        profile.record(name or '<string>',
+                       time.perf_counter() - started,
+                       profile.queries - queries)
+
+
+def install():
+    global _original_render
+    with _install_lock:
+        if _original_render is None:
+            _original_render = Template._render
+            Template._render = _profiled_render
+
+
+def uninstall():
+    global _original_render
+    with _install_lock:
+        if _original_render is not None:
+            Template._render = _original_render
+            _original_render = None
+
+
+class TemplateProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.TEMPLATE_PROFILING:
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = _state.profile = RenderProfile()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.count_query))
+                response = self.get_response(request)
+        finally:
+            _state.profile = None
+        if profile.stats:
+            logger.info(profile.report('{} {}: {} queries'.format(
+                request.method, request.get_full_path(), profile.queries)))
+        return response
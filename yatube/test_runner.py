@@ -0,0 +1,28 @@
+import copy
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class CacheClearingRunner(DiscoverRunner):
+    """Прогон тестов с пустым кешем: общий файловый кеш переносится во
+    временный каталог, рабочий BASE_DIR/cache тесты не трогают."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_dir = tempfile.mkdtemp(prefix='yatube-cache-')
+        cache_settings = copy.deepcopy(settings.CACHES)
+        cache_settings['shared']['LOCATION'] = self._cache_dir
+        self._cache_override = override_settings(CACHES=cache_settings)
+        self._cache_override.enable()
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_override.disable()
+        shutil.rmtree(self._cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -11,6 +11,7 @@ urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('admin/panel/', admin.site.urls),
+    path('api/v1/', include('api.urls', namespace='api_v1')),
     path("", include("posts.urls")),
     path('about/', include('about.urls', namespace='about')),
 ]